@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.urls import path
 from django.utils.html import format_html
-from django.http import HttpResponse
-from .models import Booking, Passenger, SeatLock, BookingSeat
+from django.template.response import TemplateResponse
+from .models import Booking, Passenger, SeatLock, BookingSeat, ReportJob, TripDailyStats
 from . import admin_pdf_views, reports_pdf_views
 
 
@@ -10,6 +10,8 @@ from . import admin_pdf_views, reports_pdf_views
 admin.site.register(BookingSeat)
 admin.site.register(SeatLock)
 admin.site.register(Passenger)
+admin.site.register(ReportJob)
+admin.site.register(TripDailyStats)
 
 
 @admin.register(Booking)
@@ -26,7 +28,7 @@ class BookingAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(admin_pdf_views.booking_pdf),
                 name="booking_pdf",
             ),
-            # reports
+            # reports: queued here, rendered by `manage.py run_report_workers`
             path(
                 "reports/",
                 self.admin_site.admin_view(self.reports_dashboard),
@@ -34,42 +36,49 @@ class BookingAdmin(admin.ModelAdmin):
             ),
             path(
                 "reports/all-bookings/",
-                self.admin_site.admin_view(reports_pdf_views.all_bookings_report),
+                self.admin_site.admin_view(reports_pdf_views.queue_report),
+                {"report": "all_bookings"},
             ),
             path(
                 "reports/all-passengers/",
-                self.admin_site.admin_view(reports_pdf_views.all_passengers_report),
+                self.admin_site.admin_view(reports_pdf_views.queue_report),
+                {"report": "all_passengers"},
             ),
             path(
                 "reports/todays-routes/",
-                self.admin_site.admin_view(reports_pdf_views.todays_routes_report),
+                self.admin_site.admin_view(reports_pdf_views.queue_report),
+                {"report": "todays_routes"},
+            ),
+            path(
+                "reports/todays-routes.json",
+                self.admin_site.admin_view(reports_pdf_views.todays_routes_json),
+                name="todays_routes_json",
+            ),
+            path(
+                "reports/jobs/<int:job_id>/",
+                self.admin_site.admin_view(reports_pdf_views.report_job_detail),
+                name="report_job",
+            ),
+            path(
+                "reports/jobs/<int:job_id>/status/",
+                self.admin_site.admin_view(reports_pdf_views.report_job_status),
+                name="report_job_status",
+            ),
+            path(
+                "reports/jobs/<int:job_id>/download/",
+                self.admin_site.admin_view(reports_pdf_views.report_job_download),
+                name="report_job_download",
             ),
         ]
         return custom_urls + urls
 
     def reports_dashboard(self, request):
-        """Custom reports dashboard with buttons."""
-        html = """
-        <h1>📊 Generate Reports</h1>
-        <p>Select which report you want to download:</p>
-        <div style="display:flex; gap:15px; margin-top:20px;">
-            <a class="button" href="all-bookings/">📄 All Bookings</a>
-            <a class="button" href="all-passengers/">👥 All Passengers</a>
-            <a class="button" href="todays-routes/">🚌 Today's Routes</a>
-        </div>
-        <style>
-            .button {
-                background-color: #0C4B33;
-                color: white;
-                padding: 10px 15px;
-                border-radius: 5px;
-                text-decoration: none;
-                font-weight: bold;
-            }
-            .button:hover { background-color: #18664f; }
-        </style>
-        """
-        return HttpResponse(html)
+        """Custom reports dashboard: queue buttons plus recent jobs."""
+        return TemplateResponse(request, "admin/reports_dashboard.html", {
+            **self.admin_site.each_context(request),
+            "title": "Generate Reports",
+            "jobs": ReportJob.objects.select_related("requested_by")[:20],
+        })
 
     def download_pdf(self, obj):
         return format_html('<a class="button" href="{}/pdf/">Download PDF</a>', obj.id)
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class BookingConfig(AppConfig):
     name = 'apps.bookings'
+
+    def ready(self):
+        from . import rollups  # noqa: F401  (keeps TripDailyStats in step with Trip and Bus edits)
+        from . import inventory  # noqa: F401  (gives new trips their TripInventory row)
+        from apps.core.metrics import register_collector
+        from .services import availability_cache_metrics
+        register_collector(availability_cache_metrics)
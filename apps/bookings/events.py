@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Per-subscriber backlog; a stream that falls this far behind drops its oldest events.
+QUEUE_SIZE = 100
+
+
+class InProcessSeatEventBroker:
+    """
+    Fan-out of seat events to the SSE streams open in this process.
+
+    Publishers may run in any thread (sync views run in a thread pool under
+    ASGI); events are handed to each subscriber's event loop thread-safely.
+    A shared backend only needs the same publish()/subscribe() pair.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, trip_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(trip_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                pass  # loop already closed; the stream is going away
+
+    @asynccontextmanager
+    async def subscribe(self, trip_id):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[trip_id].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers[trip_id].discard(entry)
+                if not self._subscribers[trip_id]:
+                    del self._subscribers[trip_id]
+
+
+def _offer(queue, event):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(
+        getattr(settings, "SEAT_EVENT_BROKER", "apps.bookings.events.InProcessSeatEventBroker")
+    )()
+
+
+def publish_seat_event(trip_id, kind, seat_ids):
+    """
+    Publish {"type": kind, "seats": [...]} for a trip once the current
+    transaction commits. kind is one of "locked", "released", "booked".
+    """
+    seat_ids = sorted(seat_ids)
+    if not seat_ids:
+        return
+    event = {"type": kind, "seats": seat_ids}
+    transaction.on_commit(lambda: get_broker().publish(trip_id, event))
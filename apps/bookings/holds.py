@@ -0,0 +1,404 @@
+"""
+Seat-hold backends.
+
+A hold reserves seats of a trip for one user until it expires; confirmed
+bookings stay the durable record of who has a seat. SEAT_HOLD_BACKEND picks
+the implementation:
+
+- DatabaseSeatHoldBackend keeps holds as SeatLock rows claimed in one
+  INSERT .. ON CONFLICT statement (the default).
+- CacheSeatHoldBackend keeps each trip's holds in one Redis entry updated
+  by compare-and-set, so competing holds are refused without a PostgreSQL
+  round trip. Its holds lapse with the entry, so the expired-lock reaper
+  only matters for the database backend.
+"""
+import json
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.buses.layout import get_seat_layout
+from apps.buses.models import Seat
+from .models import Booking, BookingSeat, SeatLock
+
+SeatHold = namedtuple("SeatHold", "seat_id user_id expires_at")
+
+
+class SeatsUnavailable(Exception):
+    """
+    Raised by acquire() when some requested seats could not be claimed.
+    """
+
+    def __init__(self, seat_ids):
+        self.seat_ids = sorted(seat_ids)
+        super().__init__(f"Seats unavailable: {self.seat_ids}")
+
+
+class SeatHoldBackend:
+    """
+    Interface of a seat-hold store. Seat ids are ints; expired holds behave
+    as if they did not exist.
+    """
+
+    def acquire(self, trip, user_id, seat_ids, expires_at):
+        """
+        Hold every seat in ``seat_ids`` for the user until ``expires_at``, or
+        none: raise SeatsUnavailable listing the seats that are booked, held
+        by someone else or not on the trip's bus. The user's other holds on
+        the trip are released. Returns (held_ids, released_ids).
+        """
+        raise NotImplementedError
+
+    def release(self, trip_id, user_id, seat_ids=None):
+        """
+        Drop the user's holds on a trip (only ``seat_ids`` when given).
+        Returns the seat ids that were still held.
+        """
+        raise NotImplementedError
+
+    def extend(self, trip_id, user_id, expires_at, seat_ids=None):
+        """
+        Move the expiry of the user's live holds on a trip to ``expires_at``.
+        Returns the seat ids extended.
+        """
+        raise NotImplementedError
+
+    def active(self, trip_id, user_id=None, now=None):
+        """
+        Live holds of a trip, optionally only the user's, as SeatHold tuples.
+        """
+        raise NotImplementedError
+
+    def active_counts(self, trip_ids, now=None):
+        """
+        {trip_id: number of live holds} for the trips that have any.
+        """
+        counts = {}
+        for trip_id in trip_ids:
+            holds = self.active(trip_id, now=now)
+            if holds:
+                counts[trip_id] = len(holds)
+        return counts
+
+    def consume(self, trip_id, user_id, seat_ids, now=None):
+        """
+        Take the user's holds over for a booking, inside its transaction.
+        Returns the seat ids of ``seat_ids`` that were still held. The holds
+        go when the transaction commits and are kept if it rolls back; the
+        trip's inventory version stops a concurrent checkout of the same holds.
+        """
+        raise NotImplementedError
+
+
+class DatabaseSeatHoldBackend(SeatHoldBackend):
+    """
+    Holds as SeatLock rows. Claims and releases are single statements, and
+    the rows a checkout deletes stay locked until its transaction ends.
+    """
+
+    @staticmethod
+    def _claim_sql(seat_count):
+        qn = connection.ops.quote_name
+        lock_table = qn(SeatLock._meta.db_table)
+        seat_table = qn(Seat._meta.db_table)
+        booking_seat_table = qn(BookingSeat._meta.db_table)
+        booking_table = qn(Booking._meta.db_table)
+        placeholders = ", ".join(["%s"] * seat_count)
+        # Insert one row per free seat of the trip's bus. A conflict on the
+        # (trip, seat) key only takes the row over when the existing lock has
+        # expired or already belongs to this user; RETURNING lists the winners.
+        return f"""
+            INSERT INTO {lock_table} (trip_id, seat_id, user_id, expires_at)
+            SELECT %s, s.id, %s, %s
+            FROM {seat_table} s
+            WHERE s.bus_id = %s
+              AND s.id IN ({placeholders})
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM {booking_seat_table} bs
+                  JOIN {booking_table} b ON b.id = bs.booking_id
+                  WHERE b.trip_id = %s AND b.status = 'CONFIRMED' AND bs.seat_id = s.id
+              )
+            ON CONFLICT (trip_id, seat_id) DO UPDATE
+            SET user_id = excluded.user_id, expires_at = excluded.expires_at
+            WHERE {lock_table}.expires_at <= %s OR {lock_table}.user_id = excluded.user_id
+            RETURNING seat_id
+        """
+
+    @staticmethod
+    def _user_locks_sql(statement, seat_ids=None, keep_seat_ids=()):
+        # WHERE trip_id = %s AND user_id = %s, narrowed to / away from seat ids.
+        sql = f"{statement} WHERE trip_id = %s AND user_id = %s"
+        if seat_ids is not None:
+            sql += f" AND seat_id IN ({', '.join(['%s'] * len(seat_ids))})"
+        if keep_seat_ids:
+            sql += f" AND seat_id NOT IN ({', '.join(['%s'] * len(keep_seat_ids))})"
+        return sql
+
+    def _delete(self, trip_id, user_id, seat_ids=None, keep_seat_ids=(), now=None):
+        # Returns [(seat_id, still_live)] for the deleted rows.
+        seat_ids = None if seat_ids is None else list(seat_ids)
+        keep_seat_ids = list(keep_seat_ids)
+        if seat_ids == []:
+            return []
+        table = connection.ops.quote_name(SeatLock._meta.db_table)
+        sql = self._user_locks_sql(f"DELETE FROM {table}", seat_ids, keep_seat_ids)
+        sql += " RETURNING seat_id, CASE WHEN expires_at > %s THEN 1 ELSE 0 END"
+        params = [
+            trip_id, user_id, *(seat_ids or ()), *keep_seat_ids,
+            connection.ops.adapt_datetimefield_value(now or timezone.now()),
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(seat_id, bool(live)) for seat_id, live in cursor.fetchall()]
+
+    def acquire(self, trip, user_id, seat_ids, expires_at):
+        seat_ids = set(seat_ids)
+        adapt = connection.ops.adapt_datetimefield_value
+        now = timezone.now()
+        params = [
+            trip.id, user_id, adapt(expires_at), trip.bus_id, *seat_ids,
+            trip.id, adapt(now),
+        ]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(self._claim_sql(len(seat_ids)), params)
+                held_ids = {row[0] for row in cursor.fetchall()}
+
+            lost_ids = seat_ids - held_ids
+            if lost_ids:
+                raise SeatsUnavailable(lost_ids)
+
+            released_ids = {
+                seat_id for seat_id, live in self._delete(trip.id, user_id, keep_seat_ids=held_ids, now=now)
+                if live
+            }
+        return held_ids, released_ids
+
+    def release(self, trip_id, user_id, seat_ids=None):
+        return {seat_id for seat_id, live in self._delete(trip_id, user_id, seat_ids) if live}
+
+    def extend(self, trip_id, user_id, expires_at, seat_ids=None):
+        seat_ids = None if seat_ids is None else list(seat_ids)
+        if seat_ids == []:
+            return set()
+        adapt = connection.ops.adapt_datetimefield_value
+        table = connection.ops.quote_name(SeatLock._meta.db_table)
+        sql = self._user_locks_sql(f"UPDATE {table} SET expires_at = %s", seat_ids)
+        sql += " AND expires_at > %s RETURNING seat_id"
+        params = [adapt(expires_at), trip_id, user_id, *(seat_ids or ()), adapt(timezone.now())]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {row[0] for row in cursor.fetchall()}
+
+    def active(self, trip_id, user_id=None, now=None):
+        locks = SeatLock.objects.filter(trip_id=trip_id, expires_at__gt=now or timezone.now())
+        if user_id is not None:
+            locks = locks.filter(user_id=user_id)
+        return [SeatHold(*row) for row in locks.values_list("seat_id", "user_id", "expires_at")]
+
+    def active_counts(self, trip_ids, now=None):
+        return dict(
+            SeatLock.objects.filter(trip_id__in=list(trip_ids), expires_at__gt=now or timezone.now())
+            .values_list("trip_id")
+            .annotate(n=Count("id"))
+        )
+
+    def consume(self, trip_id, user_id, seat_ids, now=None):
+        # Every lock of the user on the trip goes; only live ones count as taken.
+        seat_ids = set(seat_ids)
+        return {seat_id for seat_id, live in self._delete(trip_id, user_id, now=now) if live and seat_id in seat_ids}
+
+
+class CacheSeatHoldBackend(SeatHoldBackend):
+    """
+    Holds in Redis, one JSON entry per trip: {seat_id: [user_id, expiry_ts]}.
+
+    Every change is a compare-and-set of that entry: a WATCH/MULTI
+    transaction retried when another writer got there first. Without
+    SEAT_HOLD_REDIS_URL the entries live in a Django cache guarded by a
+    process-wide lock instead (single-process deployments and development
+    only). Bus membership and bookings are checked against the cached seat
+    layout and availability snapshot; checkout re-checks bookings in PostgreSQL.
+    """
+
+    _local_lock = threading.Lock()
+
+    def __init__(self, url=None, cache_alias="default"):
+        url = url or getattr(settings, "SEAT_HOLD_REDIS_URL", None)
+        if url:
+            try:
+                import redis
+            except ImportError as exc:
+                raise ImproperlyConfigured(
+                    "CacheSeatHoldBackend needs the redis package when SEAT_HOLD_REDIS_URL "
+                    "(or REDIS_URL) is set."
+                ) from exc
+
+            self.redis = redis.Redis.from_url(url)
+        else:
+            self.redis = None
+            self.cache = caches[cache_alias]
+
+    @staticmethod
+    def _key(trip_id):
+        return f"seat_hold:{trip_id}"
+
+    @staticmethod
+    def _decode(raw):
+        if not raw:
+            return {}
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        return {int(seat_id): tuple(entry) for seat_id, entry in json.loads(raw).items()}
+
+    @staticmethod
+    def _live(state, now_ts):
+        return {seat_id: entry for seat_id, entry in state.items() if entry[1] > now_ts}
+
+    @staticmethod
+    def _timeout(state):
+        # Outlive the last hold by a little; expired entries are pruned on write.
+        return max(1, int(max(expiry for _, expiry in state.values()) - time.time()) + 1)
+
+    def _read_many(self, trip_ids):
+        trip_ids = list(trip_ids)
+        if self.redis is not None:
+            raws = self.redis.mget([self._key(trip_id) for trip_id in trip_ids]) if trip_ids else []
+        else:
+            cached = self.cache.get_many([self._key(trip_id) for trip_id in trip_ids])
+            raws = [cached.get(self._key(trip_id)) for trip_id in trip_ids]
+        return {trip_id: self._decode(raw) for trip_id, raw in zip(trip_ids, raws)}
+
+    def _update(self, trip_id, change):
+        """
+        Apply ``change(state) -> (new_state, result)`` atomically; the entry
+        is only written when the state changed. Returns ``result``.
+        """
+        if self.redis is None:
+            with self._local_lock:
+                state = self._decode(self.cache.get(self._key(trip_id)))
+                new_state, result = change(state)
+                if new_state != state:
+                    if new_state:
+                        self.cache.set(self._key(trip_id), json.dumps(new_state), self._timeout(new_state))
+                    else:
+                        self.cache.delete(self._key(trip_id))
+                return result
+
+        from redis import WatchError
+
+        key = self._key(trip_id)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    state = self._decode(pipe.get(key))
+                    new_state, result = change(state)
+                    if new_state != state:
+                        pipe.multi()
+                        if new_state:
+                            pipe.set(key, json.dumps(new_state), ex=self._timeout(new_state))
+                        else:
+                            pipe.delete(key)
+                        pipe.execute()
+                    return result
+                except WatchError:
+                    continue  # someone else changed the trip's holds; re-read and retry
+
+    def acquire(self, trip, user_id, seat_ids, expires_at):
+        from .services import get_availability_snapshot
+
+        seat_ids = set(seat_ids)
+        bus_seat_ids = {seat.id for seat in get_seat_layout(trip.bus_id)}
+        refused = (seat_ids - bus_seat_ids) | (seat_ids & set(get_availability_snapshot(trip.id)["booked"]))
+        expiry_ts = expires_at.timestamp()
+
+        def change(state):
+            live = self._live(state, time.time())
+            lost = refused | {
+                seat_id for seat_id in seat_ids
+                if seat_id in live and live[seat_id][0] != user_id
+            }
+            if lost:
+                return state, (lost, None)
+            released = {
+                seat_id for seat_id, (owner, _) in live.items()
+                if owner == user_id and seat_id not in seat_ids
+            }
+            new_state = {seat_id: entry for seat_id, entry in live.items() if seat_id not in released}
+            new_state.update({seat_id: (user_id, expiry_ts) for seat_id in seat_ids})
+            return new_state, (set(), released)
+
+        lost, released = self._update(trip.id, change)
+        if lost:
+            raise SeatsUnavailable(lost)
+        return seat_ids, released
+
+    def release(self, trip_id, user_id, seat_ids=None):
+        def change(state):
+            live = self._live(state, time.time())
+            released = {
+                seat_id for seat_id, (owner, _) in live.items()
+                if owner == user_id and (seat_ids is None or seat_id in seat_ids)
+            }
+            return {seat_id: entry for seat_id, entry in live.items() if seat_id not in released}, released
+
+        return self._update(trip_id, change)
+
+    def extend(self, trip_id, user_id, expires_at, seat_ids=None):
+        expiry_ts = expires_at.timestamp()
+
+        def change(state):
+            live = self._live(state, time.time())
+            extended = {
+                seat_id for seat_id, (owner, _) in live.items()
+                if owner == user_id and (seat_ids is None or seat_id in seat_ids)
+            }
+            live.update({seat_id: (user_id, expiry_ts) for seat_id in extended})
+            return live, extended
+
+        return self._update(trip_id, change)
+
+    def active(self, trip_id, user_id=None, now=None):
+        now_ts = (now or timezone.now()).timestamp()
+        state = self._read_many([trip_id])[trip_id]
+        return [
+            SeatHold(seat_id, owner, datetime.fromtimestamp(expiry, tz=dt_timezone.utc))
+            for seat_id, (owner, expiry) in sorted(self._live(state, now_ts).items())
+            if user_id is None or owner == user_id
+        ]
+
+    def active_counts(self, trip_ids, now=None):
+        now_ts = (now or timezone.now()).timestamp()
+        counts = {}
+        for trip_id, state in self._read_many(trip_ids).items():
+            live = self._live(state, now_ts)
+            if live:
+                counts[trip_id] = len(live)
+        return counts
+
+    def consume(self, trip_id, user_id, seat_ids, now=None):
+        # Nothing changes before the booking commits, so a rollback keeps the
+        # holds; the user's other holds on the trip go with them afterwards.
+        taken = {hold.seat_id for hold in self.active(trip_id, user_id, now)} & set(seat_ids)
+        if taken == set(seat_ids):
+            transaction.on_commit(lambda: self.release(trip_id, user_id))
+        return taken
+
+
+@lru_cache(maxsize=None)
+def get_hold_backend():
+    return import_string(
+        getattr(settings, "SEAT_HOLD_BACKEND", "apps.bookings.holds.DatabaseSeatHoldBackend")
+    )()
@@ -0,0 +1,80 @@
+"""
+Optimistic concurrency for checkouts.
+
+Each trip has a TripInventory row whose version moves forward every time a
+booking for the trip commits. A checkout reads the version first, checks and
+writes its rows without locking anything, and finally swaps the version it
+read for the next one. If another checkout committed in between, the swap
+matches no row and the checkout rolls back and retries, re-checking against
+what that checkout booked.
+
+The swap is the transaction's last write, so the inventory row is only locked
+between it and the commit; conflicting checkouts fail fast instead of queuing
+behind each other's row locks.
+Every code path that confirms seats (checkout today; admin bookings, imports
+or rebooking if they are ever added) must call advance_inventory_version in
+the same transaction. Checkouts take no seat row locks, so a booking that
+skips the swap is invisible to them and the same seat can be sold twice.
+"""
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.buses.models import Trip
+from .models import TripInventory
+
+# Attempts per checkout before giving up with "trip busy".
+CHECKOUT_ATTEMPTS = 3
+
+
+class InventoryConflict(Exception):
+    """
+    Raised when a trip's inventory version moved during a checkout.
+    """
+
+    def __init__(self, trip_id):
+        self.trip_id = trip_id
+        super().__init__(f"Inventory of trip {trip_id} changed")
+
+
+def create_trip_inventory(trip_ids):
+    """
+    Insert version-0 rows for new trips; rows that already exist are left alone.
+    """
+    TripInventory.objects.bulk_create(
+        [TripInventory(trip_id=trip_id) for trip_id in trip_ids], ignore_conflicts=True, batch_size=1000,
+    )
+
+
+def get_inventory_version(trip_id):
+    """
+    Current inventory version of a trip.
+
+    Rows are created with the trip (see create_trip_inventory). The fallback
+    insert here only covers a missing row, and concurrent checkouts queue
+    behind it until the first one commits, so it must stay the exception.
+    """
+    versions = TripInventory.objects.filter(trip_id=trip_id).values_list("version", flat=True)
+    version = versions.first()
+    if version is None:
+        TripInventory.objects.bulk_create([TripInventory(trip_id=trip_id)], ignore_conflicts=True)
+        version = versions.first()
+    return version
+
+
+def advance_inventory_version(trip_id, expected):
+    """
+    Compare-and-swap the trip's version from ``expected`` to the next one;
+    raise InventoryConflict when it is no longer ``expected``.
+    """
+    updated = TripInventory.objects.filter(trip_id=trip_id, version=expected).update(
+        version=F("version") + 1
+    )
+    if not updated:
+        raise InventoryConflict(trip_id)
+
+
+@receiver(post_save, sender=Trip)
+def _create_trip_inventory(sender, instance, created, **kwargs):
+    if created:
+        create_trip_inventory([instance.id])
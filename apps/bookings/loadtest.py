@@ -0,0 +1,395 @@
+"""
+Load harness for the booking funnel: search -> trips list -> seat page and
+its JSON seat map -> select seats -> checkout. Driven by the `loadtest`
+management command.
+
+Virtual users run in threads, either in-process through Django's test
+client (which also counts queries per request) or over HTTP against a
+running server. The synthetic dataset is committed, because other threads
+and servers must see it; cleanup deletes exactly the rows of its own run,
+and seeding and cleanup refuse to run outside DEBUG unless explicitly allowed.
+"""
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time as dtime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.buses.models import Bus, Seat, Trip
+from apps.buses.seat_layouts import layout_for
+from apps.core.models import City, Route
+from .inventory import create_trip_inventory
+from .models import Booking, SeatLock
+from .rollups import create_trip_stats
+
+LOADTEST_PREFIX = "LOADTEST"
+
+STEPS = ("search", "trips_list", "seat_page", "seat_map", "select_seats", "checkout_page", "checkout")
+
+
+class DatabaseLocked(ImproperlyConfigured):
+    """
+    The database could not take concurrent writes (SQLite's "database is
+    locked"). The figures of such a run measure the lock, not the app.
+    """
+
+    def __init__(self):
+        super().__init__(
+            "The database is locked under concurrent checkouts; load-test against "
+            "PostgreSQL, or with a single virtual user on SQLite."
+        )
+
+
+def _is_database_locked(exc):
+    return isinstance(exc, OperationalError) and "database is locked" in str(exc)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StepStats:
+    """
+    Thread-safe samples for one funnel step.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+        self.conflicts = 0
+        self.retries = 0
+
+    def record(self, seconds, queries=None, error=False):
+        with self._lock:
+            self.latencies.append(seconds)
+            if queries is not None:
+                self.queries.append(queries)
+            self.errors += error
+
+    def conflict(self, retried):
+        with self._lock:
+            self.conflicts += 1
+            self.retries += retried
+
+    def summary(self, duration):
+        requests = len(self.latencies)
+        ms = [seconds * 1000 for seconds in self.latencies]
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p95_ms": round(percentile(ms, 95), 2),
+            "p99_ms": round(percentile(ms, 99), 2),
+            "mean_ms": round(sum(ms) / requests, 2) if requests else 0.0,
+            "throughput_rps": round(requests / duration, 2) if duration else 0.0,
+            "queries_per_request": round(sum(self.queries) / len(self.queries), 2) if self.queries else None,
+            "conflicts": self.conflicts,
+            "conflict_rate": round(self.conflicts / requests, 4) if requests else 0.0,
+            "retries": self.retries,
+            "retry_rate": round(self.retries / requests, 4) if requests else 0.0,
+        }
+
+
+# Dataset
+
+def check_database_allowed(allow_db=False):
+    """
+    Refuse to write the synthetic dataset to a database that may hold real
+    data: only with DEBUG on, or when the caller explicitly allows it.
+    """
+    if not (settings.DEBUG or allow_db):
+        raise ImproperlyConfigured(
+            f"The load test creates and deletes {LOADTEST_PREFIX} rows in the "
+            f"{settings.DATABASES['default']['NAME']!r} database; run it with DEBUG=True "
+            "or pass --allow-db."
+        )
+
+
+def seed_dataset(users=20, trips=10, seats_per_bus=40, password="loadtest-pass", journey_date=None,
+                 allow_db=False):
+    """
+    Create one route with ``trips`` trips on separate buses and ``users`` users.
+    Returns what the virtual users need to drive the funnel.
+    """
+    check_database_allowed(allow_db)
+    journey_date = journey_date or timezone.localdate()
+    stamp = int(time.time())
+    source = City.objects.create(name=f"{LOADTEST_PREFIX} Source {stamp}")
+    destination = City.objects.create(name=f"{LOADTEST_PREFIX} Destination {stamp}")
+    route = Route.objects.create(source=source, destination=destination)
+
+    buses = Bus.objects.bulk_create([
+        Bus(operator_name=f"{LOADTEST_PREFIX} Travels", bus_number=f"{LOADTEST_PREFIX}-{stamp}-{i}",
+            bus_type="AC_SEATER", total_seats=seats_per_bus)
+        for i in range(trips)
+    ])
+    Seat.objects.bulk_create([
+        Seat(bus=bus, seat_number=number, seat_type=seat_type, deck=deck, row=row, col=col)
+        for bus in buses
+        for number, seat_type, deck, row, col in layout_for(bus.bus_type, seats_per_bus)
+    ])
+    trip_rows = Trip.objects.bulk_create([
+        Trip(bus=bus, route=route, journey_date=journey_date,
+             departure_time=dtime(6 + i % 16), arrival_time=dtime(23, 59), base_fare=500)
+        for i, bus in enumerate(buses)
+    ])
+    create_trip_stats(trip.id for trip in trip_rows)
+    create_trip_inventory(trip.id for trip in trip_rows)
+
+    # Hash once: every synthetic user shares the password.
+    hashed = make_password(password)
+    User = get_user_model()
+    usernames = [f"{LOADTEST_PREFIX.lower()}_{stamp}_{i}" for i in range(users)]
+    User.objects.bulk_create([User(username=name, password=hashed) for name in usernames])
+
+    return {
+        "source_id": source.id,
+        "destination_id": destination.id,
+        "route_id": route.id,
+        "bus_ids": [bus.id for bus in buses],
+        "journey_date": journey_date.isoformat(),
+        "trip_ids": [trip.id for trip in trip_rows],
+        "usernames": usernames,
+        "password": password,
+    }
+
+
+def cleanup_dataset(dataset, allow_db=False):
+    """
+    Delete the rows seed_dataset created for ``dataset``, and nothing else:
+    look-alike names from other runs or real accounts are left alone.
+    """
+    check_database_allowed(allow_db)
+    buses = Bus.objects.filter(id__in=dataset["bus_ids"])
+    # Booking seats/passengers PROTECT their Seat, so bookings go before buses.
+    Booking.objects.filter(trip__bus__in=buses).delete()
+    SeatLock.objects.filter(trip__bus__in=buses).delete()
+    buses.delete()
+    Route.objects.filter(id=dataset["route_id"]).delete()
+    City.objects.filter(id__in=[dataset["source_id"], dataset["destination_id"]]).delete()
+    get_user_model().objects.filter(username__in=dataset["usernames"]).delete()
+
+
+# Transports: request(method, path, data) -> (status, location, body, queries)
+
+class InProcessTransport:
+    def __init__(self):
+        self.client = Client()
+
+    def login(self, username, password):
+        self.client.force_login(get_user_model().objects.get(username=username))
+
+    def request(self, method, path, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(path, data)
+        return response.status_code, response.get("Location", ""), response.content, len(ctx.captured_queries)
+
+    def close(self):
+        # Each virtual-user thread opened its own connection.
+        connections.close_all()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTransport:
+    """
+    Standard-library HTTP client with a cookie jar, so the harness has no
+    extra dependencies. Redirects are returned, not followed.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect,
+        )
+
+    def _csrf_token(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == "csrftoken"), "")
+
+    def login(self, username, password):
+        self.request("get", "/accounts/login/")
+        status, _, _, _ = self.request("post", "/accounts/login/", {
+            "username": username, "password": password,
+        })
+        if status != 302:
+            raise RuntimeError(f"Login failed for {username} (HTTP {status})")
+
+    def request(self, method, path, data=None):
+        url = self.base_url + path
+        if method == "post":
+            body = urllib.parse.urlencode(
+                {**(data or {}), "csrfmiddlewaretoken": self._csrf_token()}, doseq=True
+            ).encode()
+            request = urllib.request.Request(url, data=body, headers={"Referer": url})
+        else:
+            if data:
+                url += "?" + urllib.parse.urlencode(data, doseq=True)
+            request = urllib.request.Request(url)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.headers.get("Location", ""), response.read(), None
+        except urllib.error.HTTPError as response:
+            body = response.read()
+            # Only visible when the server runs with DEBUG, which shows the exception.
+            if response.code == 500 and b"database is locked" in body:
+                raise DatabaseLocked()
+            return response.code, response.headers.get("Location", ""), body, None
+
+    def close(self):
+        pass
+
+
+# Virtual users
+
+def _timed(stats, transport, step, method, path, data=None, ok=(200, 302)):
+    started = time.perf_counter()
+    try:
+        status, location, body, queries = transport.request(method, path, data)
+    except DatabaseLocked:
+        raise
+    except Exception as exc:
+        if _is_database_locked(exc):
+            raise DatabaseLocked() from exc
+        stats[step].record(time.perf_counter() - started, error=True)
+        return None, "", b""
+    stats[step].record(time.perf_counter() - started, queries, error=status not in ok)
+    return status, location, body
+
+
+def run_virtual_user(transport, dataset, username, stats, funnel, iterations=5,
+                     seats_per_booking=2, max_retries=3, rng=None, stop=None):
+    rng = rng or random.Random()
+    transport.login(username, dataset["password"])
+    trips_query = {
+        "source": dataset["source_id"],
+        "destination": dataset["destination_id"],
+        "date": dataset["journey_date"],
+    }
+
+    for _ in range(iterations):
+        if stop is not None and stop.is_set():
+            break
+        funnel.add("started")
+        _timed(stats, transport, "search", "get", "/")
+        _timed(stats, transport, "trips_list", "get", "/trips/", trips_query)
+
+        trip_id = rng.choice(dataset["trip_ids"])
+        _timed(stats, transport, "seat_page", "get", f"/trips/{trip_id}/seats/")
+        held = False
+        for attempt in range(max_retries + 1):
+            status, _, body = _timed(stats, transport, "seat_map", "get", f"/trips/{trip_id}/seats.json")
+            if status != 200:
+                break
+            available = [seat["id"] for seat in json.loads(body)["seats"] if seat["available"]]
+            if len(available) < seats_per_booking:
+                funnel.add("sold_out")
+                break
+
+            picked = rng.sample(available, seats_per_booking)
+            status, location, _ = _timed(stats, transport, "select_seats", "post",
+                                         f"/trips/{trip_id}/seats/", {"seats": picked})
+            if f"/checkout/{trip_id}/" in location:
+                held = True
+                break
+            if status != 302:
+                break
+            # Redirected back to the seat page: someone else took a seat first.
+            stats["select_seats"].conflict(retried=attempt < max_retries)
+
+        if not held:
+            funnel.add("failed")
+            continue
+
+        _timed(stats, transport, "checkout_page", "get", f"/bookings/checkout/{trip_id}/")
+        passengers = {}
+        for seat_id in picked:
+            passengers.update({
+                f"name_{seat_id}": f"Load {seat_id}", f"age_{seat_id}": "30", f"gender_{seat_id}": "Male",
+            })
+        status, location, _ = _timed(stats, transport, "checkout", "post",
+                                     f"/bookings/checkout/{trip_id}/", passengers)
+        if "/bookings/success/" in location:
+            funnel.add("completed")
+            continue
+        if status == 302:
+            # Sent back to seat selection or checkout: lost the seats or the lock.
+            stats["checkout"].conflict(retried=False)
+        funnel.add("failed")
+
+
+class FunnelCounts:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"started": 0, "completed": 0, "failed": 0, "sold_out": 0}
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+
+def run_load(dataset, transport_factory, iterations=5, seats_per_booking=2, max_retries=3, seed=None):
+    """
+    Drive one virtual user per seeded user concurrently; returns the results dict.
+    Raises DatabaseLocked, after stopping the other users, if the database
+    cannot keep up with the concurrent writes.
+    """
+    stats = {step: StepStats() for step in STEPS}
+    funnel = FunnelCounts()
+    master = random.Random(seed)
+    stop = threading.Event()
+
+    def virtual_user(username, rng_seed):
+        transport = transport_factory()
+        try:
+            run_virtual_user(transport, dataset, username, stats, funnel, iterations,
+                             seats_per_booking, max_retries, random.Random(rng_seed), stop)
+        except Exception as exc:
+            stop.set()
+            # Logging in writes too (last_login, the session).
+            if _is_database_locked(exc):
+                raise DatabaseLocked() from exc
+            raise
+        finally:
+            transport.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(dataset["usernames"])) as pool:
+        futures = [
+            pool.submit(virtual_user, username, master.random())
+            for username in dataset["usernames"]
+        ]
+        for future in futures:
+            future.result()
+    duration = time.perf_counter() - started
+
+    return {
+        "duration_s": round(duration, 3),
+        "funnel": dict(funnel.counts),
+        "bookings_per_s": round(funnel.counts["completed"] / duration, 2) if duration else 0.0,
+        "steps": {step: stats[step].summary(duration) for step in STEPS},
+    }
@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.bookings.loadtest import (
+    DatabaseLocked, HttpTransport, InProcessTransport, check_database_allowed, cleanup_dataset,
+    run_load, seed_dataset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the booking funnel (search -> trips list -> seat selection -> "
+        "checkout) with concurrent virtual users and save latency, throughput, "
+        "query and conflict figures as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users.")
+        parser.add_argument("--iterations", type=int, default=5, help="Funnel runs per user.")
+        parser.add_argument("--trips", type=int, default=10, help="Trips (one bus each) to spread users over.")
+        parser.add_argument("--seats-per-bus", type=int, default=40)
+        parser.add_argument("--seats-per-booking", type=int, default=2)
+        parser.add_argument("--max-retries", type=int, default=3,
+                            help="Seat selections a user retries after losing a seat.")
+        parser.add_argument("--base-url",
+                            help="Drive a running server (same database) instead of the in-process client.")
+        parser.add_argument("--seed", type=int, help="Random seed for repeatable seat picks.")
+        parser.add_argument("--output", help="Results file (default loadtest-<timestamp>.json).")
+        parser.add_argument("--keep-data", action="store_true", help="Leave the synthetic dataset in place.")
+        parser.add_argument("--allow-db", action="store_true",
+                            help="Write the synthetic dataset to the configured database even without DEBUG.")
+
+    def handle(self, *args, **options):
+        allow_db = options["allow_db"]
+        try:
+            check_database_allowed(allow_db)
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+
+        started_at = timezone.now()
+        dataset = seed_dataset(
+            users=options["users"], trips=options["trips"], seats_per_bus=options["seats_per_bus"],
+            allow_db=allow_db,
+        )
+
+        if options["base_url"]:
+            mode = "http"
+            factory = lambda: HttpTransport(options["base_url"])
+            hosts = settings.ALLOWED_HOSTS
+        else:
+            mode = "in-process"
+            factory = InProcessTransport
+            hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+
+        try:
+            with override_settings(ALLOWED_HOSTS=hosts):
+                results = run_load(
+                    dataset, factory,
+                    iterations=options["iterations"],
+                    seats_per_booking=options["seats_per_booking"],
+                    max_retries=options["max_retries"],
+                    seed=options["seed"],
+                )
+        except DatabaseLocked as exc:
+            raise CommandError(str(exc))
+        finally:
+            if not options["keep_data"]:
+                cleanup_dataset(dataset, allow_db)
+
+        results = {
+            "started_at": started_at.isoformat(),
+            "mode": mode,
+            "database": settings.DATABASES["default"]["ENGINE"].rsplit(".", 1)[-1],
+            "config": {
+                key: options[key] for key in (
+                    "users", "iterations", "trips", "seats_per_bus", "seats_per_booking",
+                    "max_retries", "base_url", "seed",
+                )
+            },
+            **results,
+        }
+        output = Path(options["output"] or f"loadtest-{started_at:%Y%m%d-%H%M%S}.json")
+        output.write_text(json.dumps(results, indent=2))
+
+        self.stdout.write(f"{'step':<14}{'reqs':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'q/req':>7}{'confl':>8}")
+        for step, row in results["steps"].items():
+            self.stdout.write(
+                f"{step:<14}{row['requests']:>7}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}"
+                f"{row['throughput_rps']:>9}{row['queries_per_request'] or '-':>7}{row['conflict_rate']:>8}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Funnel {results['funnel']} in {results['duration_s']}s; results saved to {output}."
+        ))
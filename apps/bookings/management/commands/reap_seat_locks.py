@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.bookings.reaper import DEFAULT_BATCH_SIZE, reap_expired_locks, run_periodically
+
+
+class Command(BaseCommand):
+    help = "Delete expired seat locks across all trips in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument(
+            "--every", type=int, default=0, metavar="SECONDS",
+            help="Keep running and reap every SECONDS (run as a single dedicated process).",
+        )
+
+    def handle(self, *args, **options):
+        if options["every"]:
+            self.stdout.write(f"Reaping expired seat locks every {options['every']}s.")
+            run_periodically(options["every"], options["batch_size"])
+            return
+
+        result = reap_expired_locks(
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+        )
+
+        for i, (deleted, seconds) in enumerate(result["batches"], start=1):
+            self.stdout.write(f"batch {i}: deleted {deleted} locks in {seconds * 1000:.1f} ms")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result['deleted']} expired seat locks in {len(result['batches'])} batches."
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.buses.models import Trip
+from apps.bookings.rollups import rebuild_trip_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the TripDailyStats rollup from bookings and locks "
+        "(backfill, or to correct drift). Defaults to today."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="First journey date (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="date_to", help="Last journey date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        date_from = parse_date(options["date_from"]) if options["date_from"] else today
+        date_to = parse_date(options["date_to"]) if options["date_to"] else date_from
+        if date_from is None or date_to is None or date_to < date_from:
+            raise CommandError("Invalid date range.")
+
+        trips = Trip.objects.filter(journey_date__range=(date_from, date_to)).select_related("bus")
+        count = 0
+        for trip in trips.iterator(chunk_size=500):
+            rebuild_trip_stats(trip)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {count} trips from {date_from} to {date_to}."
+        ))
@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F
+
+from apps.bookings.models import ReportJob
+from apps.bookings.report_jobs import claim_next_job, fail_job, recover_stale_jobs, retry_job
+from apps.bookings.report_worker import init_worker, run_job
+
+
+class Command(BaseCommand):
+    help = "Render queued admin reports in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+        parser.add_argument("--poll-interval", type=float, default=2.0)
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit when the queue is empty instead of polling forever.",
+        )
+
+    @staticmethod
+    def _new_pool(processes):
+        # Never hand an open DB connection to child processes.
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        pool = self._new_pool(processes)
+        running = {}
+        # Jobs left to run one at a time after a pool broke under several jobs,
+        # so the one that kills its worker is found without taking others along.
+        solo = 0
+
+        try:
+            while True:
+                # Jobs whose worker went away, here or on another host, would
+                # otherwise stay RUNNING forever.
+                requeued, failed = recover_stale_jobs()
+                if requeued or failed:
+                    self.stdout.write(f"Recovered stale jobs: {requeued} requeued, {failed} failed.")
+
+                lost = 0  # jobs that went down with a broken pool
+                for future, job_id in list(running.items()):
+                    if future.done():
+                        del running[future]
+                        lost += self._finish(job_id, future)
+                        solo = max(0, solo - 1)
+                broken = bool(lost)
+
+                while not broken and len(running) < (1 if solo else processes):
+                    job_id = claim_next_job()
+                    if job_id is None:
+                        break
+                    self.stdout.write(f"job {job_id}: started")
+                    try:
+                        running[pool.submit(run_job, job_id)] = job_id
+                    except BrokenProcessPool as exc:
+                        retry_job(job_id, repr(exc))
+                        lost += 1
+                        broken = True
+
+                if broken:
+                    # A worker process died (killed, out of memory) and took the
+                    # pool with it; every job still in it fails the same way.
+                    wait(running)
+                    for future, job_id in running.items():
+                        lost += self._finish(job_id, future)
+                    solo = lost if lost > 1 else 0
+                    running = {}
+                    pool.shutdown(wait=True)
+                    self.stdout.write("Worker pool broke; starting a new one.")
+                    pool = self._new_pool(processes)
+                    continue
+
+                if options["once"] and not running:
+                    break
+                time.sleep(options["poll_interval"])
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            for future, job_id in running.items():
+                self._finish(job_id, future)
+
+    def _finish(self, job_id, future):
+        """
+        Record the outcome of a job its worker could not record itself.
+        Returns True when the worker pool is broken.
+        """
+        broken = False
+        if future.cancelled():
+            # Shut down before a worker picked it up: leave it for the next run.
+            ReportJob.objects.filter(id=job_id, status="RUNNING").update(
+                status="QUEUED", started_at=None, heartbeat_at=None, attempts=F("attempts") - 1
+            )
+        elif isinstance(future.exception(), BrokenProcessPool):
+            # Not necessarily this job's fault: retry it within its attempts.
+            retry_job(job_id, "Worker process died.")
+            broken = True
+        elif future.exception() is not None:
+            # The worker died before it could record the outcome itself.
+            fail_job(job_id, repr(future.exception()))
+        status = ReportJob.objects.filter(id=job_id).values_list("status", flat=True).first()
+        self.stdout.write(f"job {job_id}: {status}")
+        return broken
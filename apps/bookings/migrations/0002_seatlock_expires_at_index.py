@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='seatlock',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
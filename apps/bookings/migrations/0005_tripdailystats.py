@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_reportjob'),
+        ('buses', '0002_trip_search_index'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripDailyStats',
+            fields=[
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='daily_stats', serialize=False, to='buses.trip')),
+                ('journey_date', models.DateField()),
+                ('departure_time', models.TimeField()),
+                ('seats_total', models.PositiveIntegerField(default=0)),
+                ('seats_sold', models.IntegerField(default=0)),
+                ('seats_locked', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='buses.bus')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.route')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['journey_date', 'route', 'departure_time'], name='tripstats_day_route_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_booking_history_index'),
+        ('buses', '0005_tripschedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripInventory',
+            fields=[
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inventory', serialize=False, to='buses.trip')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
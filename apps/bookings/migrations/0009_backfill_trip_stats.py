@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill(apps, schema_editor):
+    Trip = apps.get_model("buses", "Trip")
+    Booking = apps.get_model("bookings", "Booking")
+    BookingSeat = apps.get_model("bookings", "BookingSeat")
+    TripDailyStats = apps.get_model("bookings", "TripDailyStats")
+
+    # Every trip gets its rollup row up front, so booking paths only ever
+    # apply deltas to an existing row. Locked counts are refreshed by holds.
+    trips = Trip.objects.filter(daily_stats__isnull=True).select_related("bus")
+    trip_ids = list(trips.values_list("id", flat=True))
+    for start in range(0, len(trip_ids), 1000):
+        batch = trip_ids[start:start + 1000]
+        sold = dict(
+            BookingSeat.objects.filter(booking__trip_id__in=batch, booking__status="CONFIRMED")
+            .values_list("booking__trip_id").annotate(n=Count("id"))
+        )
+        revenue = dict(
+            Booking.objects.filter(trip_id__in=batch, status="CONFIRMED")
+            .values_list("trip_id").annotate(total=Sum("total_fare"))
+        )
+        TripDailyStats.objects.bulk_create([
+            TripDailyStats(
+                trip_id=trip.id, route_id=trip.route_id, bus_id=trip.bus_id,
+                journey_date=trip.journey_date, departure_time=trip.departure_time,
+                seats_total=trip.bus.total_seats, seats_sold=sold.get(trip.id, 0),
+                revenue=revenue.get(trip.id) or 0,
+            )
+            for trip in trips.filter(id__in=batch)
+        ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_reportjob_heartbeat'),
+        ('buses', '0005_tripschedule'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
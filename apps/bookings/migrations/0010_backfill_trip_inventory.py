@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    Trip = apps.get_model("buses", "Trip")
+    TripInventory = apps.get_model("bookings", "TripInventory")
+
+    # Every trip gets its inventory row up front, so concurrent first
+    # checkouts read it instead of queuing behind one another's insert.
+    trip_ids = list(Trip.objects.filter(inventory__isnull=True).values_list("id", flat=True))
+    for start in range(0, len(trip_ids), 1000):
+        TripInventory.objects.bulk_create(
+            [TripInventory(trip_id=trip_id) for trip_id in trip_ids[start:start + 1000]],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_backfill_trip_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
-from apps.buses.models import Trip, Seat
+from apps.buses.models import Bus, Trip, Seat
+from apps.core.models import Route
 
 import uuid
 
@@ -11,7 +12,7 @@ class SeatLock(models.Model):
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="locks")
     seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)  # used by the expired-lock reaper
 
     class Meta:
         unique_together = ("trip", "seat")  # IMPORTANT
@@ -29,6 +30,13 @@ class Booking(models.Model):
     status = models.CharField(max_length=10, choices=STATUS, default="PENDING")
     total_fare = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=1, editable=False)  # bumped on changes; keys cached ticket PDFs
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's booking history.
+            models.Index(fields=["user", "-created_at", "-id"], name="booking_user_history_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.pnr:
@@ -49,3 +57,87 @@ class BookingSeat(models.Model):
 
     class Meta:
         unique_together = ("booking", "seat")
+
+
+class TripInventory(models.Model):
+    """
+    Version of a trip's confirmed seat inventory. Checkouts compare-and-swap it
+    instead of locking BookingSeat rows (see apps.bookings.inventory).
+    """
+    trip = models.OneToOneField(Trip, on_delete=models.CASCADE, primary_key=True, related_name="inventory")
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.trip_id} v{self.version}"
+
+
+class ReportJob(models.Model):
+    REPORTS = [
+        ("all_bookings", "All Bookings"),
+        ("all_passengers", "Today's Passengers"),
+        ("todays_routes", "Today's Routes"),
+    ]
+    FORMATS = [("pdf", "PDF"), ("csv", "CSV")]
+    STATUS = [("QUEUED", "Queued"), ("RUNNING", "Running"), ("DONE", "Done"), ("FAILED", "Failed")]
+
+    report = models.CharField(max_length=30, choices=REPORTS)
+    format = models.CharField(max_length=5, choices=FORMATS, default="pdf")
+    # report + format + parameters (e.g. the date); identical requests share a job
+    dedup_key = models.CharField(max_length=100, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS, default="QUEUED")
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    file_name = models.CharField(max_length=255, blank=True)
+    download_name = models.CharField(max_length=255, blank=True)  # set when the job finishes
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched by the worker as it makes progress; a RUNNING job whose heartbeat
+    # goes stale lost its worker (see recover_stale_jobs).
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"], name="reportjob_queue_idx")]
+
+    @property
+    def progress(self):
+        if self.status == "DONE":
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, self.rows_done * 100 // self.rows_total)
+
+    def __str__(self):
+        return f"{self.get_report_display()} ({self.format}) - {self.status}"
+
+
+class TripDailyStats(models.Model):
+    """
+    Per-trip rollup for operational reports, maintained incrementally by the
+    booking paths (see rollups.py) so reports never scan Booking/BookingSeat.
+    """
+    trip = models.OneToOneField(Trip, on_delete=models.CASCADE, primary_key=True, related_name="daily_stats")
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="+")
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name="+")
+    journey_date = models.DateField()
+    departure_time = models.TimeField()
+    seats_total = models.PositiveIntegerField(default=0)
+    seats_sold = models.IntegerField(default=0)
+    seats_locked = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["journey_date", "route", "departure_time"], name="tripstats_day_route_idx"),
+        ]
+
+    @property
+    def load_factor(self):
+        return round(self.seats_sold / self.seats_total, 3) if self.seats_total else 0.0
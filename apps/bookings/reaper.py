@@ -0,0 +1,75 @@
+import logging
+import time
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import SeatLock
+from .rollups import refresh_locked_seats_for_trips
+
+DEFAULT_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def reap_expired_locks(batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """
+    Delete expired SeatLocks across all trips in batches of ``batch_size``.
+
+    Each batch is a short transaction of its own (select ids through the
+    expires_at index, then delete those ids), so the reaper never holds locks
+    for long. Returns {"deleted": int, "batches": [(deleted, seconds), ...]}.
+    """
+    cutoff = timezone.now()
+    batches = []
+    total = 0
+
+    while max_batches is None or len(batches) < max_batches:
+        started = time.perf_counter()
+        with transaction.atomic():
+            rows = list(
+                SeatLock.objects.filter(expires_at__lte=cutoff)
+                .order_by("expires_at")
+                .values_list("id", "trip_id")[:batch_size]
+            )
+            if not rows:
+                break
+
+            # Re-check expiry: a hold may have taken the row over since the select.
+            deleted, _ = SeatLock.objects.filter(
+                id__in=[lock_id for lock_id, _ in rows], expires_at__lte=cutoff
+            ).delete()
+            refresh_locked_seats_for_trips(trip_id for _, trip_id in rows)
+        batches.append((deleted, time.perf_counter() - started))
+        total += deleted
+
+        if len(rows) < batch_size:
+            break
+
+    return {"deleted": total, "batches": batches}
+
+
+def run_periodically(interval, batch_size=DEFAULT_BATCH_SIZE, stop_event=None):
+    """
+    Reap every ``interval`` seconds until ``stop_event`` (a threading.Event) is
+    set. Used by `reap_seat_locks --every`, which runs as its own process.
+    """
+    while True:
+        try:
+            result = reap_expired_locks(batch_size=batch_size)
+            if result["deleted"]:
+                logger.info(
+                    "Reaped %d expired seat locks in %d batches (%s ms)",
+                    result["deleted"], len(result["batches"]),
+                    ", ".join(f"{seconds * 1000:.1f}" for _, seconds in result["batches"]),
+                )
+        except Exception:
+            # Keep the loop alive across transient DB errors; next tick retries.
+            logger.exception("Seat lock reaper run failed")
+        finally:
+            close_old_connections()
+        if stop_event is not None:
+            if stop_event.wait(interval):
+                return
+        else:
+            time.sleep(interval)
@@ -0,0 +1,170 @@
+import tempfile
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ReportJob
+
+# Requests for the same report within this window share one job.
+REPORT_JOB_DEDUP_SECONDS = getattr(settings, "REPORT_JOB_DEDUP_SECONDS", 60)
+
+# Minimum seconds between progress writes from a running job.
+PROGRESS_INTERVAL = 0.5
+
+# A RUNNING job without a heartbeat for this long is taken to have lost its worker.
+REPORT_JOB_STALE_SECONDS = getattr(settings, "REPORT_JOB_STALE_SECONDS", 600)
+
+# Claims per job; a stale job that used them all is failed instead of requeued.
+REPORT_JOB_MAX_ATTEMPTS = 2
+
+
+@lru_cache(maxsize=None)
+def get_report_storage():
+    """
+    Storage for finished report files, configured like an entry of STORAGES.
+    """
+    config = getattr(settings, "REPORT_STORAGE", {})
+    backend = config.get("BACKEND", "django.core.files.storage.FileSystemStorage")
+    options = config.get("OPTIONS", {"location": settings.MEDIA_ROOT / "reports"})
+    return import_string(backend)(**options)
+
+
+def report_dedup_key(report, fmt):
+    # Reports are "as of today", so the date is part of their identity.
+    return f"{report}:{fmt}:{timezone.localdate().isoformat()}"
+
+
+def queue_report_job(report, fmt, user=None):
+    """
+    Queue a report, or return the matching job that is queued, running or
+    finished within REPORT_JOB_DEDUP_SECONDS. Returns (job, created).
+    """
+    key = report_dedup_key(report, fmt)
+    now = timezone.now()
+    recent = now - timedelta(seconds=REPORT_JOB_DEDUP_SECONDS)
+
+    with transaction.atomic():
+        job = (
+            ReportJob.objects.select_for_update()
+            .filter(dedup_key=key)
+            .filter(
+                Q(status="QUEUED")
+                | Q(status="RUNNING", heartbeat_at__gte=_stale_cutoff(now))
+                | Q(status="DONE", finished_at__gte=recent)
+            )
+            .order_by("-created_at")
+            .first()
+        )
+        if job:
+            return job, False
+
+        job = ReportJob.objects.create(
+            report=report,
+            format=fmt,
+            dedup_key=key,
+            requested_by=user if user and user.is_authenticated else None,
+        )
+        return job, True
+
+
+def _stale_cutoff(now=None):
+    return (now or timezone.now()) - timedelta(seconds=REPORT_JOB_STALE_SECONDS)
+
+
+def recover_stale_jobs():
+    """
+    Requeue RUNNING jobs whose worker went away (no heartbeat within
+    REPORT_JOB_STALE_SECONDS), or fail them once they used up their attempts.
+    Returns (requeued, failed).
+    """
+    # Rows claimed before heartbeats existed have none and count as stale.
+    stale = ReportJob.objects.filter(status="RUNNING").filter(
+        Q(heartbeat_at__lt=_stale_cutoff()) | Q(heartbeat_at__isnull=True)
+    )
+    failed = stale.filter(attempts__gte=REPORT_JOB_MAX_ATTEMPTS).update(
+        status="FAILED", error="Worker stopped responding.", finished_at=timezone.now()
+    )
+    requeued = stale.update(status="QUEUED", started_at=None, heartbeat_at=None)
+    return requeued, failed
+
+
+def claim_next_job():
+    """
+    Move the oldest queued job to RUNNING and return its id (None if idle).
+    SKIP LOCKED lets several worker hosts poll the same table.
+    """
+    with transaction.atomic():
+        job = (
+            ReportJob.objects.select_for_update(skip_locked=True)
+            .filter(status="QUEUED")
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "RUNNING"
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "heartbeat_at", "attempts"])
+        return job.id
+
+
+def retry_job(job_id, error):
+    """
+    Put a RUNNING job back in the queue after its worker died, or fail it
+    with ``error`` once it used REPORT_JOB_MAX_ATTEMPTS. Returns the new status.
+    """
+    jobs = ReportJob.objects.filter(id=job_id, status="RUNNING")
+    if jobs.filter(attempts__gte=REPORT_JOB_MAX_ATTEMPTS).update(
+        status="FAILED", error=error, finished_at=timezone.now()
+    ):
+        return "FAILED"
+    jobs.update(status="QUEUED", started_at=None, heartbeat_at=None)
+    return "QUEUED"
+
+
+def fail_job(job_id, error):
+    ReportJob.objects.filter(id=job_id).exclude(status="DONE").update(
+        status="FAILED", error=error, finished_at=timezone.now()
+    )
+
+
+def run_report_job(job_id):
+    """
+    Render a claimed job and store its file. Runs inside a worker process.
+    """
+    from .reports_pdf_views import render_report
+
+    job = ReportJob.objects.get(id=job_id)
+    last_write = 0.0
+
+    def progress(done, total):
+        nonlocal last_write
+        now = time.monotonic()
+        if done == 0 or now - last_write >= PROGRESS_INTERVAL:
+            ReportJob.objects.filter(id=job_id).update(
+                rows_done=done, rows_total=total, heartbeat_at=timezone.now()
+            )
+            last_write = now
+
+    try:
+        with tempfile.TemporaryFile() as out:
+            total, filename = render_report(job.report, job.format, out, progress)
+            out.seek(0)
+            name = get_report_storage().save(f"report-{job.id}.{job.format}", File(out))
+    except Exception as exc:
+        fail_job(job_id, repr(exc))
+        return
+
+    ReportJob.objects.filter(id=job_id).update(
+        status="DONE", file_name=name, rows_done=total, rows_total=total,
+        download_name=f"{filename}_{job.created_at:%Y%m%d_%H%M}.{job.format}",
+        finished_at=timezone.now(),
+    )
@@ -0,0 +1,21 @@
+"""
+Entry points for report worker processes.
+
+Workers are spawned rather than forked, so they must set Django up
+themselves; this module imports nothing from Django at load time.
+"""
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def run_job(job_id):
+    from django.db import connections
+    from .report_jobs import run_report_job
+
+    try:
+        run_report_job(job_id)
+    finally:
+        connections.close_all()
@@ -1,43 +1,286 @@
-from django.http import HttpResponse
+import csv
+import io
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.template.loader import get_template
+from django.template.response import TemplateResponse
+from django.views.decorators.http import require_POST
 from xhtml2pdf import pisa
-from io import BytesIO
-from datetime import date
-from .models import Booking, Passenger
-from apps.core.models import Route
+from pypdf import PdfWriter
+from django.db.models import Count, Sum
+from .models import Booking, Passenger, ReportJob, TripDailyStats
+from .report_jobs import get_report_storage, queue_report_job
+from .rollups import refresh_locked_seats_for_day
 
 from django.utils import timezone
 
-def generate_pdf(template_path, context, filename):
+# Rows rendered per xhtml2pdf pass; peak memory follows this, not the table size.
+REPORT_CHUNK_ROWS = 500
+
+# pypdf keeps every merged page in memory until the PDF is written (about
+# 1 KB per table row), so larger reports are refused in favour of CSV.
+REPORT_PDF_MAX_ROWS = getattr(settings, "REPORT_PDF_MAX_ROWS", 100_000)
+
+
+def iter_chunks(rows, size=REPORT_CHUNK_ROWS):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_pdf(template_path, rows_name, rows, context, out, progress=None):
+    """
+    Render ``rows`` in fixed-size chunks, one xhtml2pdf pass per chunk, and
+    write the merged PDF to ``out``.
+
+    ``rows`` should come from ``queryset.iterator()`` so PostgreSQL feeds them
+    through a server-side cursor instead of loading the whole table. Only the
+    HTML and xhtml2pdf pass are bounded by the chunk size: the merged pages
+    stay in memory until the end, which is what REPORT_PDF_MAX_ROWS caps.
+    """
     template = get_template(template_path)
-    html = template.render(context)
-    result = BytesIO()
-    pdf = pisa.CreatePDF(html, dest=result)
-    if pdf.err:
-        return HttpResponse("Error generating PDF", status=500)
-    response = HttpResponse(result.getvalue(), content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename={filename}.pdf'
-    return response
-
-def all_bookings_report(request):
-    bookings = Booking.objects.select_related("trip", "user").all()
-    return generate_pdf("admin/reports/all_bookings.html", {"bookings": bookings}, "all_bookings")
-
-def all_passengers_report(request):
+    writer = PdfWriter()
+    done = 0
+
+    for index, chunk in enumerate(iter_chunks(rows)):
+        html = template.render({**context, rows_name: chunk, "first_chunk": index == 0})
+        with tempfile.TemporaryFile() as part:
+            pdf = pisa.CreatePDF(html, dest=part)
+            if pdf.err:
+                raise RuntimeError("Error generating PDF")
+            part.seek(0)
+            writer.append(part)
+        done += len(chunk)
+        if progress:
+            progress(done)
+
+    if not writer.pages:
+        html = template.render({**context, rows_name: [], "first_chunk": True})
+        with tempfile.TemporaryFile() as part:
+            pisa.CreatePDF(html, dest=part)
+            part.seek(0)
+            writer.append(part)
+
+    writer.write(out)
+    writer.close()
+
+
+def write_csv(header, rows, out, progress=None):
+    """
+    Write ``rows`` (tuples) to the binary file ``out`` as UTF-8 CSV.
+    """
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(header)
+    for done, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if progress and done % REPORT_CHUNK_ROWS == 0:
+            progress(done)
+    text.detach()
+
+
+def all_bookings_report():
+    bookings = Booking.objects.select_related(
+        "user", "trip", "trip__bus", "trip__route",
+        "trip__route__source", "trip__route__destination"
+    ).order_by("id")
+    return {
+        "queryset": bookings,
+        "template": "admin/reports/all_bookings.html",
+        "rows_name": "bookings",
+        "context": {},
+        "header": ["ID", "User", "Trip", "Amount", "Date"],
+        "row": lambda b: (b.id, b.user.username, b.trip, b.total_fare, b.created_at),
+        "filename": "all_bookings",
+    }
+
+
+def all_passengers_report():
     today = timezone.localdate()
 
     passengers = Passenger.objects.filter(
         booking__status="CONFIRMED",
         booking__trip__journey_date=today
-    ).select_related("booking", "booking__trip", "seat")
+    ).select_related("booking").order_by("id")
+    return {
+        "queryset": passengers,
+        "template": "admin/reports/all_passengers.html",
+        "rows_name": "passengers",
+        "context": {},
+        "header": ["ID", "Name", "Gender", "PNR"],
+        "row": lambda p: (p.id, p.name, p.gender, p.booking.pnr),
+        "filename": "today_passengers",
+    }
+
 
-    return generate_pdf(
-        "admin/reports/all_passengers.html",
-        {"passengers": passengers},
-        "today_passengers"
+def todays_route_summary(today):
+    """
+    Per-route totals for a day, aggregated from the TripDailyStats rollup only.
+    """
+    rows = (
+        TripDailyStats.objects.filter(journey_date=today)
+        .values("route_id", "route__source__name", "route__destination__name")
+        .annotate(
+            trips=Count("trip_id"),
+            seats_total=Sum("seats_total"),
+            seats_sold=Sum("seats_sold"),
+            seats_locked=Sum("seats_locked"),
+            revenue=Sum("revenue"),
+        )
+        .order_by("route__source__name", "route__destination__name")
     )
+    return [
+        {
+            "route_id": row["route_id"],
+            "source": row["route__source__name"],
+            "destination": row["route__destination__name"],
+            "trips": row["trips"],
+            "seats_total": row["seats_total"],
+            "seats_sold": row["seats_sold"],
+            "seats_locked": row["seats_locked"],
+            "load_factor": round(row["seats_sold"] / row["seats_total"], 3) if row["seats_total"] else 0.0,
+            "revenue": row["revenue"],
+        }
+        for row in rows
+    ]
+
+
+def todays_routes_report():
+    today = timezone.localdate()
+    refresh_locked_seats_for_day(today)
+    trips = (
+        TripDailyStats.objects.filter(journey_date=today)
+        .select_related("route__source", "route__destination", "bus")
+        .order_by("route__source__name", "route__destination__name", "departure_time")
+    )
+    return {
+        "queryset": trips,
+        "template": "admin/reports/todays_routes.html",
+        "rows_name": "trips",
+        "context": {"today": today, "routes": todays_route_summary(today)},
+        "header": [
+            "Source", "Destination", "Bus", "Departure", "Seats", "Sold", "Locked",
+            "Load factor", "Revenue",
+        ],
+        "row": lambda t: (
+            t.route.source, t.route.destination, t.bus.bus_number, t.departure_time,
+            t.seats_total, t.seats_sold, t.seats_locked, t.load_factor, t.revenue,
+        ),
+        "filename": "todays_routes",
+    }
+
+
+def todays_routes_json(request):
+    """
+    JSON variant of the today's-routes report, served straight from the rollup.
+    """
+    today = timezone.localdate()
+    refresh_locked_seats_for_day(today)
+    trips = (
+        TripDailyStats.objects.filter(journey_date=today)
+        .select_related("bus")
+        .order_by("route_id", "departure_time")
+    )
+    by_route = {}
+    for t in trips:
+        by_route.setdefault(t.route_id, []).append({
+            "trip": t.trip_id,
+            "bus": t.bus.bus_number,
+            "departure_time": t.departure_time.isoformat(),
+            "seats_total": t.seats_total,
+            "seats_sold": t.seats_sold,
+            "seats_locked": t.seats_locked,
+            "load_factor": t.load_factor,
+            "revenue": str(t.revenue),
+        })
+
+    routes = todays_route_summary(today)
+    for route in routes:
+        route["revenue"] = str(route["revenue"])
+        route["trip_stats"] = by_route.get(route["route_id"], [])
+    return JsonResponse({"date": today.isoformat(), "routes": routes})
+
+
+REPORTS = {
+    "all_bookings": all_bookings_report,
+    "all_passengers": all_passengers_report,
+    "todays_routes": todays_routes_report,
+}
+
+
+def render_report(report, fmt, out, progress=None):
+    """
+    Render a report into the binary file ``out``. Runs in report worker
+    processes; ``progress(rows_done, rows_total)`` is called as chunks finish.
+    Returns (rows rendered, base name for the downloaded file).
+    """
+    spec = REPORTS[report]()
+    total = spec["queryset"].count()
+    if fmt != "csv" and total > REPORT_PDF_MAX_ROWS:
+        raise ValueError(
+            f"{total} rows is more than a PDF report holds ({REPORT_PDF_MAX_ROWS}); download it as CSV."
+        )
+    rows = spec["queryset"].iterator(chunk_size=REPORT_CHUNK_ROWS)
+    if progress:
+        progress(0, total)
+
+    if fmt == "csv":
+        write_csv(spec["header"], (spec["row"](obj) for obj in rows), out,
+                  progress and (lambda done: progress(done, total)))
+    else:
+        write_pdf(spec["template"], spec["rows_name"], rows, spec["context"], out,
+                  progress and (lambda done: progress(done, total)))
+    return total, spec["filename"]
+
+
+# Admin views: web workers only queue jobs and serve finished files.
+
+@require_POST
+def queue_report(request, report):
+    if report not in REPORTS:
+        raise Http404("Unknown report")
+    fmt = "csv" if request.POST.get("format") == "csv" else "pdf"
+    job, created = queue_report_job(report, fmt, request.user)
+    if not created:
+        messages.info(request, "An identical report was requested moments ago; showing that job.")
+    return redirect("admin:report_job", job_id=job.id)
+
+
+def report_job_detail(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id)
+    return TemplateResponse(request, "admin/reports/job_detail.html", {
+        **admin.site.each_context(request),
+        "job": job,
+        "title": str(job),
+    })
+
+
+def report_job_status(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id)
+    return JsonResponse({
+        "id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "rows_done": job.rows_done,
+        "rows_total": job.rows_total,
+        "error": job.error,
+    })
+
 
-def todays_routes_report(request):
-    today = date.today()
-    routes = Route.objects.all()  # adjust if your trip model differs
-    return generate_pdf("admin/reports/todays_routes.html", {"routes": routes, "today": today}, "todays_routes")
\ No newline at end of file
+def report_job_download(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id, status="DONE")
+    try:
+        handle = get_report_storage().open(job.file_name, "rb")
+    except FileNotFoundError:
+        raise Http404("Report file no longer available")
+    content_type = "text/csv" if job.format == "csv" else "application/pdf"
+    filename = job.download_name or f"report-{job.id}.{job.format}"
+    return FileResponse(handle, as_attachment=True, filename=filename, content_type=content_type)
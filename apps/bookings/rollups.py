@@ -0,0 +1,155 @@
+import logging
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.buses.models import Bus, Trip
+from .holds import get_hold_backend
+from .models import Booking, BookingSeat, TripDailyStats
+
+logger = logging.getLogger(__name__)
+
+
+def _trip_fields(trip):
+    return {
+        "route_id": trip.route_id,
+        "bus_id": trip.bus_id,
+        "journey_date": trip.journey_date,
+        "departure_time": trip.departure_time,
+        "seats_total": trip.bus.total_seats,
+    }
+
+
+def rebuild_trip_stats(trip):
+    """
+    Recompute one trip's rollup from the raw tables. Used for backfill and
+    drift correction only; request paths apply deltas instead.
+    """
+    sold = BookingSeat.objects.filter(booking__trip=trip, booking__status="CONFIRMED").count()
+    revenue = Booking.objects.filter(trip=trip, status="CONFIRMED").aggregate(
+        total=Sum("total_fare")
+    )["total"] or 0
+    locked = get_hold_backend().active_counts([trip.id]).get(trip.id, 0)
+
+    stats, _ = TripDailyStats.objects.update_or_create(
+        trip=trip,
+        defaults={**_trip_fields(trip), "seats_sold": sold, "seats_locked": locked, "revenue": revenue},
+    )
+    return stats
+
+
+def _apply_delta(trip_id, seats, revenue):
+    # Rows exist from trip creation (_sync_trip, create_trip_stats, or the
+    # 0009 backfill), so this is always a single F() update. Rebuilding here
+    # instead would double count when two first bookings race.
+    updated = TripDailyStats.objects.filter(trip_id=trip_id).update(
+        seats_sold=F("seats_sold") + seats,
+        revenue=F("revenue") + revenue,
+    )
+    if not updated:
+        logger.warning("No TripDailyStats row for trip %s; run rebuild_trip_stats", trip_id)
+
+
+def record_booking_confirmed(booking, seat_count):
+    """
+    Add a confirmed booking to its trip's rollup (call inside the booking transaction).
+    """
+    _apply_delta(booking.trip_id, seat_count, booking.total_fare)
+    refresh_locked_seats(booking.trip_id)
+
+
+def record_booking_cancelled(booking, seat_count):
+    """
+    Remove a cancelled booking from its trip's rollup (call inside the cancel transaction).
+    """
+    _apply_delta(booking.trip_id, -seat_count, -booking.total_fare)
+
+
+def create_trip_stats(trip_ids):
+    """
+    Insert empty rollup rows for trips created in bulk, which bypasses
+    _sync_trip. Rows that already exist are left alone.
+    """
+    trip_ids = list(trip_ids)
+    qn = connection.ops.quote_name
+    sql = f"""
+        INSERT INTO {qn(TripDailyStats._meta.db_table)}
+            (trip_id, route_id, bus_id, journey_date, departure_time,
+             seats_total, seats_sold, seats_locked, revenue, updated_at)
+        SELECT t.id, t.route_id, t.bus_id, t.journey_date, t.departure_time,
+               b.total_seats, 0, 0, 0, %s
+        FROM {qn(Trip._meta.db_table)} t
+        JOIN {qn(Bus._meta.db_table)} b ON b.id = t.bus_id
+        WHERE t.id IN ({{placeholders}})
+        ON CONFLICT (trip_id) DO NOTHING
+    """
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        for start in range(0, len(trip_ids), 1000):
+            batch = trip_ids[start:start + 1000]
+            cursor.execute(sql.format(placeholders=", ".join(["%s"] * len(batch))), [now, *batch])
+
+
+def refresh_locked_seats(trip_id):
+    """
+    Re-count a trip's active holds into its rollup after the transaction commits,
+    so the extra statement never runs while seat rows are locked.
+    """
+    def refresh():
+        TripDailyStats.objects.filter(trip_id=trip_id).update(
+            seats_locked=get_hold_backend().active_counts([trip_id]).get(trip_id, 0)
+        )
+    transaction.on_commit(refresh)
+
+
+def refresh_locked_seats_for_day(journey_date):
+    """
+    Re-count live holds for one day's trips and store the counts that moved.
+    Reports call this first: a hold that lapses writes nothing (the cache
+    backend has no reaper), so the stored seats_locked can be stale.
+    """
+    stored = dict(
+        TripDailyStats.objects.filter(journey_date=journey_date).values_list("trip_id", "seats_locked")
+    )
+    counts = get_hold_backend().active_counts(stored)
+    changed = [
+        TripDailyStats(trip_id=trip_id, seats_locked=counts.get(trip_id, 0))
+        for trip_id, locked in stored.items()
+        if counts.get(trip_id, 0) != locked
+    ]
+    TripDailyStats.objects.bulk_update(changed, ["seats_locked"], batch_size=1000)
+
+
+def refresh_locked_seats_for_trips(trip_ids):
+    """
+    Batch variant for the lock reaper: one grouped count, then one update per trip.
+    """
+    trip_ids = set(trip_ids)
+    if not trip_ids:
+        return
+    counts = get_hold_backend().active_counts(trip_ids)
+    for trip_id in trip_ids:
+        TripDailyStats.objects.filter(trip_id=trip_id).update(seats_locked=counts.get(trip_id, 0))
+
+
+@receiver(post_save, sender=Trip)
+def _sync_trip(sender, instance, created, **kwargs):
+    # Keep the copied trip attributes in step with admin edits.
+    if created:
+        TripDailyStats.objects.get_or_create(
+            trip=instance, defaults=_trip_fields(instance)
+        )
+    else:
+        TripDailyStats.objects.filter(trip=instance).update(**_trip_fields(instance))
+
+
+@receiver(post_save, sender=Bus)
+def _sync_bus_seats(sender, instance, created, **kwargs):
+    # seats_total is copied from the bus; follow capacity edits.
+    if not created:
+        TripDailyStats.objects.filter(bus=instance).exclude(seats_total=instance.total_seats).update(
+            seats_total=instance.total_seats
+        )
@@ -1,19 +1,296 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.utils import timezone
-from .models import SeatLock, BookingSeat
+from apps.buses.models import Trip
+from .models import BookingSeat, Passenger
+from .events import publish_seat_event
+from .holds import SeatsUnavailable, get_hold_backend
+from .rollups import refresh_locked_seats
+
+# How long a computed availability snapshot may live in the cache. Expired
+# locks are filtered on read, so this only bounds memory, not correctness.
+AVAILABILITY_CACHE_TIMEOUT = getattr(settings, "SEAT_AVAILABILITY_CACHE_TIMEOUT", 300)
+
+# Seats-left counts on listings may lag by this many seconds (0 disables).
+SEATS_LEFT_CACHE_TIMEOUT = getattr(settings, "SEATS_LEFT_CACHE_TIMEOUT", 15)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _version_key(trip_id):
+    return f"seat_avail:version:{trip_id}"
+
+
+def _snapshot_key(trip_id):
+    return f"seat_avail:snapshot:{trip_id}"
+
+
+def _seats_left_key(trip_id):
+    return f"seat_avail:left:{trip_id}"
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def availability_cache_stats():
+    """
+    Process-local hit/miss counters for the seat availability cache.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def availability_cache_metrics():
+    """
+    Prometheus lines for the availability cache counters (see apps.core.metrics).
+    """
+    stats = availability_cache_stats()
+    return [
+        "# HELP seat_availability_cache_requests_total Seat availability snapshot lookups by result.",
+        "# TYPE seat_availability_cache_requests_total counter",
+        f'seat_availability_cache_requests_total{{result="hit"}} {stats["hits"]}',
+        f'seat_availability_cache_requests_total{{result="miss"}} {stats["misses"]}',
+    ]
+
+
+def get_availability_version(trip_id):
+    """
+    Current availability version for a trip. The counter is seeded from the
+    clock so a version key that was evicted never reuses an old number.
+    """
+    key = _version_key(trip_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_availability_version(trip_id):
+    """
+    Invalidate the cached availability of a trip by moving its version forward.
+    """
+    key = _version_key(trip_id)
+    cache.delete(_seats_left_key(trip_id))
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (never read or evicted): start a fresh clock-based version.
+        cache.add(key, int(time.time() * 1000), None)
+        return cache.incr(key)
+
+
+def invalidate_unavailable_seats(trip_id):
+    """
+    Bump the trip version once the surrounding transaction commits, so readers
+    never re-cache rows that are about to be rolled back.
+    """
+    transaction.on_commit(lambda: bump_availability_version(trip_id))
+
+
+def _load_snapshot(trip_id, now):
+    holds = get_hold_backend().active(trip_id, now=now)
+    booked_ids = list(
+        BookingSeat.objects.filter(
+            booking__trip_id=trip_id,
+            booking__status="CONFIRMED"
+        ).values_list("seat_id", flat=True)
+    )
+    return {
+        "bus_id": Trip.objects.filter(id=trip_id, active=True).values_list("bus_id", flat=True).first(),
+        "locks": {hold.seat_id: hold.expires_at.timestamp() for hold in holds},
+        "booked": booked_ids,
+    }
+
+
+def get_availability_snapshot(trip_id, now=None):
+    """
+    Cached {"version", "bus_id", "locks": {seat_id: expiry_ts}, "booked": [seat_id]}
+    for a trip.
+
+    The version key and the snapshot are fetched in one round trip; the
+    snapshot is only trusted when it was built for the current version.
+    bus_id is None for a missing or inactive trip, and such a snapshot is
+    not cached.
+    """
+    now = now or timezone.now()
+    version_key = _version_key(trip_id)
+    snapshot_key = _snapshot_key(trip_id)
+
+    cached = cache.get_many([version_key, snapshot_key])
+    version = cached.get(version_key)
+    snapshot = cached.get(snapshot_key)
+
+    if version is not None and snapshot is not None and snapshot["version"] == version:
+        _count("hits")
+    else:
+        _count("misses")
+        if version is None:
+            version = get_availability_version(trip_id)
+        snapshot = _load_snapshot(trip_id, now)
+        snapshot["version"] = version
+        if snapshot["bus_id"] is not None:
+            cache.set(snapshot_key, snapshot, AVAILABILITY_CACHE_TIMEOUT)
+
+    return snapshot
+
+
+def unavailable_from_snapshot(snapshot, now=None):
+    now_ts = (now or timezone.now()).timestamp()
+    locked_ids = {seat_id for seat_id, expires in snapshot["locks"].items() if expires > now_ts}
+    return locked_ids | set(snapshot["booked"])
+
+
+def availability_etag(trip_id, snapshot, now=None, layout_version=None):
+    """
+    Strong ETag for a trip's seat map: the availability version plus how many
+    cached locks have lapsed since, so silent lock expiry also changes the tag,
+    and the bus's seat layout version.
+    """
+    now_ts = (now or timezone.now()).timestamp()
+    lapsed = sum(1 for expires in snapshot["locks"].values() if expires <= now_ts)
+    return f'"{trip_id}-{snapshot["version"]}-{lapsed}-{layout_version}"'
+
+
+@receiver(post_save, sender=Trip)
+def _invalidate_edited_trip(sender, instance, created, **kwargs):
+    # A deactivated or re-assigned trip must not keep serving its old snapshot.
+    if not created:
+        invalidate_unavailable_seats(instance.id)
+
 
 def get_unavailable_seat_ids(trip):
     """
     Unavailable = (locked and not expired) OR (already booked in confirmed booking).
+
+    Served from the per-trip availability snapshot in the cache.
     """
     now = timezone.now()
+    return unavailable_from_snapshot(get_availability_snapshot(trip.id, now), now)
+
+
+def _count_subquery(queryset, trip_field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{trip_field: OuterRef("pk")})
+            .order_by()
+            .values(trip_field)
+            .annotate(n=Count("id"))
+            .values("n"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def get_seats_left(trip_ids):
+    """
+    {trip_id: seats left} = bus.total_seats - confirmed booked seats - active holds.
+
+    Everything missing from the cache is computed in one grouped query over
+    the whole result set, plus one hold count from the hold backend.
+    """
+    trip_ids = list(trip_ids)
+    seats_left = {}
+    if SEATS_LEFT_CACHE_TIMEOUT:
+        cached = cache.get_many([_seats_left_key(trip_id) for trip_id in trip_ids])
+        for trip_id in trip_ids:
+            value = cached.get(_seats_left_key(trip_id))
+            if value is not None:
+                seats_left[trip_id] = value
+
+    missing = [trip_id for trip_id in trip_ids if trip_id not in seats_left]
+    if missing:
+        now = timezone.now()
+        rows = Trip.objects.filter(id__in=missing).annotate(
+            booked=_count_subquery(
+                BookingSeat.objects.filter(booking__status="CONFIRMED"), "booking__trip"
+            ),
+        ).values_list("id", "bus__total_seats", "booked")
+        locked = get_hold_backend().active_counts(missing, now)
+
+        computed = {
+            trip_id: max(0, total - booked - locked.get(trip_id, 0))
+            for trip_id, total, booked in rows
+        }
+        seats_left.update(computed)
+        if SEATS_LEFT_CACHE_TIMEOUT:
+            cache.set_many(
+                {_seats_left_key(trip_id): left for trip_id, left in computed.items()},
+                SEATS_LEFT_CACHE_TIMEOUT,
+            )
+
+    return seats_left
+
+
+def annotate_seats_left(trips):
+    """
+    Set ``seats_left`` and ``sold_out`` on each trip of an evaluated list.
+    """
+    seats_left = get_seats_left(trip.id for trip in trips)
+    for trip in trips:
+        trip.seats_left = seats_left.get(trip.id, 0)
+        trip.sold_out = trip.seats_left == 0
+    return trips
+
+
+def hold_seats(trip, user, seat_ids, expires_at):
+    """
+    Hold all requested seats of a trip for a user through the hold backend.
+
+    All-or-nothing: if any seat is booked, held by someone else, or not on the
+    trip's bus, nothing is kept and SeatsUnavailable lists exactly those seats.
+    On success the user's other holds on this trip are released.
+    """
+    seat_ids = set(seat_ids)
+    if not seat_ids:
+        return set()
+
+    # No transaction here: the database backend opens its own, and a refused
+    # hold on the cache backend should not reach PostgreSQL at all.
+    held_ids, released_ids = get_hold_backend().acquire(trip, user.id, seat_ids, expires_at)
+    invalidate_unavailable_seats(trip.id)
+    publish_seat_event(trip.id, "locked", held_ids)
+    publish_seat_event(trip.id, "released", released_ids)
+    refresh_locked_seats(trip.id)
+
+    return held_ids
+
+
+def parse_passenger_details(data, seat_ids):
+    """
+    Read name_<seat_id>, age_<seat_id> and gender_<seat_id> for every seat.
+
+    Returns {seat_id: {"name", "age", "gender"}}; raises ValueError on the first
+    missing or malformed field so nothing is written for a bad form.
+    """
+    passengers = {}
+    for seat_id in seat_ids:
+        name = data.get(f"name_{seat_id}", "").strip()
+        age = data.get(f"age_{seat_id}", "").strip()
+        gender = data.get(f"gender_{seat_id}", "").strip()
+
+        if not name or not age or not gender:
+            raise ValueError("Missing passenger details.")
 
-    locked_ids = SeatLock.objects.filter(
-        trip=trip, expires_at__gt=now
-    ).values_list("seat_id", flat=True)
+        if (len(name) > Passenger._meta.get_field("name").max_length
+                or len(gender) > Passenger._meta.get_field("gender").max_length):
+            raise ValueError("Passenger details too long.")
 
-    booked_ids = BookingSeat.objects.filter(
-        booking__trip=trip,
-        booking__status="CONFIRMED"
-    ).values_list("seat_id", flat=True)
+        age = int(age)
+        if not 1 <= age <= 120:
+            raise ValueError("Invalid passenger age.")
 
-    return set(locked_ids) | set(booked_ids)
\ No newline at end of file
+        passengers[seat_id] = {"name": name, "age": age, "gender": gender}
+    return passengers
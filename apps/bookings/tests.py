@@ -1,3 +1,702 @@
-from django.test import TestCase
+import asyncio
+import csv
+import functools
+import io
+import itertools
+import threading
+from datetime import time, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from pypdf import PdfReader
+
+from apps.buses.models import Bus, Seat, Trip
+from apps.buses.seat_layouts import layout_for
+from apps.core.models import City, Route
+from . import events, reports_pdf_views, views
+from .holds import SeatsUnavailable, get_hold_backend
+from .inventory import InventoryConflict, advance_inventory_version, get_inventory_version
+from .models import Booking, BookingSeat, Passenger, ReportJob, SeatLock, TripDailyStats, TripInventory
+from .report_jobs import (
+    REPORT_JOB_STALE_SECONDS, claim_next_job, queue_report_job, recover_stale_jobs, retry_job,
+)
+from .services import get_availability_version, get_seats_left, get_unavailable_seat_ids, hold_seats
+from .tickets import get_ticket_storage, render_ticket_pdf, ticket_pdf_name, ticket_queryset
+
+
+_trip_numbers = itertools.count(1)
+
+
+def create_trip(seats=8, fare=500):
+    n = next(_trip_numbers)
+    route = Route.objects.create(
+        source=City.objects.create(name=f"Source {n}"),
+        destination=City.objects.create(name=f"Destination {n}"),
+    )
+    bus = Bus.objects.create(operator_name="Test Travels", bus_number=f"TEST-{n}", bus_type="AC_SEATER",
+                             total_seats=seats)
+    Seat.objects.bulk_create([
+        Seat(bus=bus, seat_number=number, seat_type=seat_type, deck=deck, row=row, col=col)
+        for number, seat_type, deck, row, col in layout_for(bus.bus_type, seats)
+    ])
+    return Trip.objects.create(bus=bus, route=route, journey_date=timezone.localdate(),
+                               departure_time=time(9), arrival_time=time(15), base_fare=fare)
+
+
+def passenger_form(seat_ids):
+    form = {}
+    for seat_id in seat_ids:
+        form.update({f"name_{seat_id}": f"Passenger {seat_id}", f"age_{seat_id}": "30",
+                     f"gender_{seat_id}": "Male"})
+    return form
+
+
+class CheckoutMixin:
+    def setUp(self):
+        # Availability versions, snapshots and cache-backed holds are keyed by
+        # trip id, which the database may hand out again in the next test.
+        cache.clear()
+        self.trip = create_trip()
+        self.seat_ids = list(Seat.objects.filter(bus=self.trip.bus).order_by("id").values_list("id", flat=True))
+        self.user = get_user_model().objects.create_user(username="rider", password="pass")
+        self.client.force_login(self.user)
+
+    def hold(self, seat_ids, client=None):
+        response = (client or self.client).post(
+            reverse("select_seats", args=[self.trip.id]), {"seats": seat_ids}
+        )
+        self.assertRedirects(response, reverse("checkout", args=[self.trip.id]), fetch_redirect_response=False)
+
+    def checkout(self, seat_ids, client=None):
+        return (client or self.client).post(reverse("checkout", args=[self.trip.id]), passenger_form(seat_ids))
+
+    def cancel(self, booking):
+        return self.client.post(reverse("cancel_booking", args=[booking.id]), {"reason": "Plans changed"})
+
+
+class AvailabilityTests(CheckoutMixin, TestCase):
+    def test_booking_and_cancelling_move_the_version(self):
+        version = get_availability_version(self.trip.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids[:2])
+        after_hold = get_availability_version(self.trip.id)
+        self.assertGreater(after_hold, version)
+        self.assertEqual(get_unavailable_seat_ids(self.trip), set(self.seat_ids[:2]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout(self.seat_ids[:2])
+        after_booking = get_availability_version(self.trip.id)
+        self.assertGreater(after_booking, after_hold)
+        self.assertEqual(get_unavailable_seat_ids(self.trip), set(self.seat_ids[:2]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cancel(Booking.objects.get(trip=self.trip))
+        self.assertGreater(get_availability_version(self.trip.id), after_booking)
+        self.assertEqual(get_unavailable_seat_ids(self.trip), set())
+
+    def test_rolled_back_checkout_leaves_the_version(self):
+        self.hold(self.seat_ids[:2])
+        version = get_availability_version(self.trip.id)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.checkout(self.seat_ids[:1])  # form is missing a passenger
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_availability_version(self.trip.id), version)
+
+
+class SeatMapApiTests(CheckoutMixin, TestCase):
+    def url(self, trip_id=None):
+        return reverse("seat_map_api", args=[trip_id or self.trip.id])
+
+    def test_unchanged_map_is_not_modified(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["seats"]), len(self.seat_ids))
+
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_or_inactive_trip_is_not_found(self):
+        inactive = create_trip()
+        Trip.objects.filter(id=inactive.id).update(active=False)
+
+        for trip_id in (inactive.id, inactive.id + 1000):
+            for etag in ("", "*"):
+                with self.subTest(trip_id=trip_id, etag=etag):
+                    response = self.client.get(self.url(trip_id), HTTP_IF_NONE_MATCH=etag)
+
+                    self.assertEqual(response.status_code, 404)
+        self.assertIsNone(cache.get(f"seat_avail:snapshot:{inactive.id}"))
+
+    def test_deactivating_a_trip_drops_its_cached_map(self):
+        etag = self.client.get(self.url())["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip.active = False
+            self.trip.save()
+
+        self.assertEqual(self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_login_is_required(self):
+        self.client.logout()
+
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH="*")
+
+        self.assertEqual(response.status_code, 302)
+
+
+class SeatsLeftTests(CheckoutMixin, TestCase):
+    def test_one_grouped_count_for_the_whole_listing(self):
+        other = create_trip()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids[:1])
+            self.checkout(self.seat_ids[:1])
+            self.hold(self.seat_ids[1:3])
+        cache.clear()
+
+        # One grouped count over Trip, one hold count from the hold backend.
+        with self.assertNumQueries(2):
+            seats_left = get_seats_left([self.trip.id, other.id])
+
+        self.assertEqual(seats_left, {self.trip.id: 5, other.id: 8})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_seats_left([self.trip.id, other.id]), seats_left)
+
+    def test_new_hold_drops_the_cached_count(self):
+        get_seats_left([self.trip.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids[:2])
+
+        self.assertEqual(get_seats_left([self.trip.id]), {self.trip.id: 6})
+
+    def test_listing_shows_sold_out_trips(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids)
+        route = self.trip.route
+
+        response = self.client.get(reverse("trips_list"), {
+            "source": route.source_id, "destination": route.destination_id,
+            "date": self.trip.journey_date.isoformat(),
+        })
+
+        self.assertEqual([trip.sold_out for trip in response.context["trips"]], [True])
+        self.assertContains(response, "Sold Out")
+
+
+class SeatEventTests(CheckoutMixin, TestCase):
+    def published(self):
+        broker = mock.Mock()
+        patcher = mock.patch.object(events, "get_broker", return_value=broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return broker
+
+    def test_holds_and_bookings_are_published_after_commit(self):
+        broker = self.published()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids[:2])
+            self.assertEqual(broker.publish.call_count, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout(self.seat_ids[:2])
+
+        self.assertEqual(broker.publish.call_args_list, [
+            mock.call(self.trip.id, {"type": "locked", "seats": self.seat_ids[:2]}),
+            mock.call(self.trip.id, {"type": "booked", "seats": self.seat_ids[:2]}),
+        ])
+
+    def test_rolled_back_checkout_publishes_nothing(self):
+        self.hold(self.seat_ids[:2])
+        broker = self.published()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout(self.seat_ids[:1])  # form is missing a passenger
+
+        broker.publish.assert_not_called()
+
+    async def test_broker_fans_out_and_drops_the_oldest_backlog(self):
+        broker = events.InProcessSeatEventBroker()
+
+        async with broker.subscribe(1) as first, broker.subscribe(1) as second:
+            publisher = threading.Thread(target=lambda: [
+                broker.publish(1, {"n": n}) for n in range(events.QUEUE_SIZE + 1)
+            ])
+            publisher.start()
+            publisher.join()
+            broker.publish(2, {"n": "other trip"})
+            await asyncio.sleep(0)
+
+            for queue in (first, second):
+                self.assertEqual(queue.qsize(), events.QUEUE_SIZE)
+                self.assertEqual(queue.get_nowait(), {"n": 1})
+        self.assertEqual(broker._subscribers, {})
+
+    @override_settings(SEAT_EVENTS_ENABLED=False)
+    def test_stream_is_off_under_wsgi(self):
+        self.assertEqual(self.client.get(reverse("seat_events", args=[self.trip.id])).status_code, 204)
+
+    @override_settings(SEAT_EVENTS_ENABLED=True)
+    async def test_stream_needs_an_active_trip_and_a_login(self):
+        url = reverse("seat_events", args=[self.trip.id])
+        self.assertEqual((await self.async_client.get(url)).status_code, 302)
+
+        await self.async_client.aforce_login(self.user)
+        missing = await self.async_client.get(reverse("seat_events", args=[self.trip.id + 1000]))
+        response = await self.async_client.get(url)
+
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        await stream.aclose()
+
+
+@override_settings(TICKET_PDF_STORAGE={"BACKEND": "django.core.files.storage.InMemoryStorage", "OPTIONS": {}})
+class TicketPdfTests(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        get_ticket_storage.cache_clear()
+        self.addCleanup(get_ticket_storage.cache_clear)
+        # WeasyPrint is optional; a stand-in records each render.
+        self.weasyprint = mock.Mock()
+        self.weasyprint.HTML.return_value.write_pdf.side_effect = lambda: b"%PDF-1.7 ticket"
+        patcher = mock.patch.dict("sys.modules", {"weasyprint": self.weasyprint})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids[:2])
+            self.checkout(self.seat_ids[:2])
+        self.booking = Booking.objects.get(trip=self.trip)
+        self.url = reverse("ticket_pdf", args=[self.booking.id])
+
+    def download(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def test_rendered_once_per_version(self):
+        first = self.download()
+        second = self.download()
+
+        self.assertEqual(b"".join(second.streaming_content), first.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertEqual(self.weasyprint.HTML.call_count, 1)
+        self.assertEqual(self.download(**{"If-None-Match": first["ETag"]}).status_code, 304)
+
+    def test_version_bump_drops_the_old_pdf(self):
+        etag = self.download()["ETag"]
+        old_name = ticket_pdf_name(self.booking)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cancel(self.booking)
+
+        self.assertFalse(get_ticket_storage().exists(old_name))
+        response = self.download(**{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(self.weasyprint.HTML.call_count, 2)
+
+    def test_racing_renders_keep_one_file(self):
+        booking = ticket_queryset().get(id=self.booking.id)
+
+        render_ticket_pdf(booking)
+        render_ticket_pdf(booking)
+
+        self.assertEqual(get_ticket_storage().listdir("")[1], [ticket_pdf_name(booking)])
+
+
+class BookingHistoryTests(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.past_trip = create_trip()
+        Trip.objects.filter(id=self.past_trip.id).update(journey_date=timezone.localdate() - timedelta(days=1))
+        self.upcoming = [self.book(self.trip, seats=2) for _ in range(views.HISTORY_PAGE_SIZE + 2)]
+        self.past = [self.book(self.past_trip)]
+        other = get_user_model().objects.create_user(username="someone", password="pass")
+        Booking.objects.create(user=other, trip=self.trip, status="CONFIRMED", total_fare=500)
+
+    def book(self, trip, seats=1):
+        booking = Booking.objects.create(user=self.user, trip=trip, status="CONFIRMED", total_fare=500 * seats)
+        seat_ids = Seat.objects.filter(bus=trip.bus).order_by("id").values_list("id", flat=True)[:seats]
+        BookingSeat.objects.bulk_create([
+            BookingSeat(booking=booking, seat_id=seat_id, fare=500) for seat_id in seat_ids
+        ])
+        Passenger.objects.bulk_create([
+            Passenger(booking=booking, seat_id=seat_id, name="Rider", age=30, gender="Male") for seat_id in seat_ids
+        ])
+        return booking
+
+    def page(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("booking_history"), params)
+        return response, len(queries)
+
+    def test_upcoming_pages_newest_first_at_a_constant_cost(self):
+        first, first_queries = self.page()
+        second, second_queries = self.page(cursor=first.context["next_cursor"])
+
+        newest_first = [booking.id for booking in reversed(self.upcoming)]
+        self.assertEqual([b.id for b in first.context["bookings"]], newest_first[:views.HISTORY_PAGE_SIZE])
+        self.assertEqual([b.id for b in second.context["bookings"]], newest_first[views.HISTORY_PAGE_SIZE:])
+        self.assertIsNone(second.context["next_cursor"])
+        self.assertEqual(first_queries, second_queries)
+
+    def test_past_tab_lists_earlier_journeys(self):
+        response, _ = self.page(tab="past")
+
+        self.assertEqual(response.context["tab"], "past")
+        self.assertEqual([b.id for b in response.context["bookings"]], [self.past[0].id])
+
+
+class RollupTests(CheckoutMixin, TestCase):
+    def stats(self):
+        return TripDailyStats.objects.values("seats_sold", "seats_locked", "revenue").get(trip=self.trip)
+
+    def test_trip_creation_adds_an_empty_row(self):
+        self.assertEqual(self.stats(), {"seats_sold": 0, "seats_locked": 0, "revenue": 0})
+
+    def test_booking_and_cancelling_apply_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids[:2])
+        self.assertEqual(self.stats(), {"seats_sold": 0, "seats_locked": 2, "revenue": 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout(self.seat_ids[:2])
+        self.assertEqual(self.stats(), {"seats_sold": 2, "seats_locked": 0, "revenue": 1000})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids[2:3])
+            self.checkout(self.seat_ids[2:3])
+        self.assertEqual(self.stats(), {"seats_sold": 3, "seats_locked": 0, "revenue": 1500})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cancel(Booking.objects.earliest("id"))
+        self.assertEqual(self.stats(), {"seats_sold": 1, "seats_locked": 0, "revenue": 500})
+
+    def test_cancelling_twice_counts_once(self):
+        self.hold(self.seat_ids[:2])
+        self.checkout(self.seat_ids[:2])
+        booking = Booking.objects.get(trip=self.trip)
+
+        self.cancel(booking)
+        self.cancel(booking)
+
+        self.assertEqual(self.stats()["seats_sold"], 0)
+        self.assertEqual(self.stats()["revenue"], 0)
+
+    def test_bus_capacity_edit_reaches_the_rollup(self):
+        bus = self.trip.bus
+        bus.total_seats = 12
+        bus.save()
+
+        self.assertEqual(TripDailyStats.objects.get(trip=self.trip).seats_total, 12)
+
+    def test_report_drops_lapsed_holds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hold(self.seat_ids[:2])
+        SeatLock.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        spec = reports_pdf_views.todays_routes_report()
+
+        self.assertEqual(self.stats()["seats_locked"], 0)
+        self.assertEqual(spec["context"]["routes"][0]["seats_locked"], 0)
+
+
+class HoldSeatsMixin:
+    backend = None
+
+    def setUp(self):
+        cache.clear()
+        settings_override = override_settings(SEAT_HOLD_BACKEND=self.backend, SEAT_HOLD_REDIS_URL=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_hold_backend.cache_clear()
+        self.addCleanup(get_hold_backend.cache_clear)
+
+        self.trip = create_trip()
+        self.seat_ids = list(Seat.objects.filter(bus=self.trip.bus).order_by("id").values_list("id", flat=True))
+        User = get_user_model()
+        self.alice = User.objects.create_user(username="alice", password="pass")
+        self.bob = User.objects.create_user(username="bob", password="pass")
+        self.expires_at = timezone.now() + timedelta(minutes=10)
+
+    def held(self, user):
+        return {hold.seat_id for hold in get_hold_backend().active(self.trip.id, user.id)}
+
+    def test_overlapping_hold_is_refused_whole(self):
+        hold_seats(self.trip, self.alice, self.seat_ids[:2], self.expires_at)
+
+        with self.assertRaises(SeatsUnavailable) as refused:
+            hold_seats(self.trip, self.bob, self.seat_ids[1:4], self.expires_at)
+
+        self.assertEqual(refused.exception.seat_ids, [self.seat_ids[1]])
+        self.assertEqual(self.held(self.alice), set(self.seat_ids[:2]))
+        self.assertEqual(self.held(self.bob), set())
+
+    def test_expired_hold_can_be_taken(self):
+        hold_seats(self.trip, self.alice, self.seat_ids[:2], timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(hold_seats(self.trip, self.bob, self.seat_ids[:2], self.expires_at), set(self.seat_ids[:2]))
+        self.assertEqual(self.held(self.alice), set())
+
+    def test_new_hold_releases_the_users_other_seats(self):
+        hold_seats(self.trip, self.alice, self.seat_ids[:2], self.expires_at)
+        hold_seats(self.trip, self.alice, self.seat_ids[1:3], self.expires_at)
+
+        self.assertEqual(self.held(self.alice), set(self.seat_ids[1:3]))
+        self.assertEqual(hold_seats(self.trip, self.bob, self.seat_ids[:1], self.expires_at), {self.seat_ids[0]})
+
+    def test_seat_of_another_bus_is_refused(self):
+        other = create_trip()
+        other_seat = Seat.objects.filter(bus=other.bus).values_list("id", flat=True).first()
+
+        with self.assertRaises(SeatsUnavailable) as refused:
+            hold_seats(self.trip, self.alice, [self.seat_ids[0], other_seat], self.expires_at)
+
+        self.assertEqual(refused.exception.seat_ids, [other_seat])
+        self.assertEqual(self.held(self.alice), set())
+
+    def test_booked_seat_is_refused(self):
+        self.client.force_login(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("select_seats", args=[self.trip.id]), {"seats": self.seat_ids[:1]})
+            self.client.post(reverse("checkout", args=[self.trip.id]), passenger_form(self.seat_ids[:1]))
+        self.assertTrue(Booking.objects.filter(trip=self.trip, status="CONFIRMED").exists())
+
+        with self.assertRaises(SeatsUnavailable) as refused:
+            hold_seats(self.trip, self.bob, self.seat_ids[:2], self.expires_at)
+
+        self.assertEqual(refused.exception.seat_ids, [self.seat_ids[0]])
+
+
+class DatabaseHoldSeatsTests(HoldSeatsMixin, TestCase):
+    backend = "apps.bookings.holds.DatabaseSeatHoldBackend"
+
+
+class CacheHoldSeatsTests(HoldSeatsMixin, TestCase):
+    backend = "apps.bookings.holds.CacheSeatHoldBackend"
+
+
+class InventoryTests(CheckoutMixin, TestCase):
+    def test_new_trip_starts_with_an_inventory_row(self):
+        self.assertEqual(TripInventory.objects.get(trip=self.trip).version, 0)
+
+    def test_swap_only_from_the_current_version(self):
+        version = get_inventory_version(self.trip.id)
+        advance_inventory_version(self.trip.id, version)
+
+        with self.assertRaises(InventoryConflict):
+            advance_inventory_version(self.trip.id, version)
+        self.assertEqual(get_inventory_version(self.trip.id), version + 1)
+
+    def test_every_booking_advances_the_version(self):
+        for seat_id in self.seat_ids[:3]:
+            self.hold([seat_id])
+            self.checkout([seat_id])
+
+        self.assertEqual(Booking.objects.filter(trip=self.trip).count(), 3)
+        self.assertEqual(get_inventory_version(self.trip.id), 3)
+
+
+class CheckoutRetryTests(CheckoutMixin, TestCase):
+    def stale_versions(self, times):
+        # The first ``times`` reads return the version before the current one,
+        # as if another checkout committed right after the read.
+        calls = []
+
+        def read(trip_id):
+            calls.append(trip_id)
+            version = get_inventory_version(trip_id)
+            return version - 1 if len(calls) <= times else version
+
+        return mock.patch.object(views, "get_inventory_version", read)
+
+    def test_retries_after_a_conflicting_commit(self):
+        self.hold(self.seat_ids[:1])
+        self.checkout(self.seat_ids[:1])
+
+        self.hold(self.seat_ids[1:3])
+        with self.stale_versions(1), mock.patch.object(views, "record_seat_conflict") as conflict:
+            response = self.checkout(self.seat_ids[1:3])
+
+        booking = Booking.objects.latest("id")
+        self.assertRedirects(response, reverse("booking_success", args=[booking.id]), fetch_redirect_response=False)
+        self.assertEqual(sorted(booking.seats.values_list("seat_id", flat=True)), self.seat_ids[1:3])
+        conflict.assert_called_once_with("checkout_inventory_retry")
+        self.assertEqual(TripInventory.objects.get(trip=self.trip).version, 2)
+
+    def test_gives_up_when_the_trip_stays_busy(self):
+        self.hold(self.seat_ids[:1])
+        self.checkout(self.seat_ids[:1])
+
+        self.hold(self.seat_ids[1:3])
+        with self.stale_versions(views.CHECKOUT_ATTEMPTS), \
+                mock.patch.object(views, "record_seat_conflict") as conflict:
+            response = self.checkout(self.seat_ids[1:3])
+
+        self.assertRedirects(response, reverse("checkout", args=[self.trip.id]), fetch_redirect_response=False)
+        self.assertEqual(
+            [call.args[0] for call in conflict.call_args_list],
+            ["checkout_inventory_retry"] * views.CHECKOUT_ATTEMPTS + ["checkout_busy"],
+        )
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(TripInventory.objects.get(trip=self.trip).version, 1)
+        # Every attempt rolled back, so the holds are still there to try again.
+        self.assertEqual(self.client.get(reverse("checkout", args=[self.trip.id])).status_code, 200)
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Needs concurrent writers; SQLite locks the whole database (or table, in memory).",
+)
+class ConcurrentCheckoutTests(CheckoutMixin, TransactionTestCase):
+    def test_two_checkouts_of_the_same_seat_book_it_once(self):
+        seat_ids = self.seat_ids[:2]
+        self.hold(seat_ids)
+        clients = [Client(), Client()]
+        for client in clients:
+            client.force_login(self.user)
+
+        # Both submits read the inventory version before either commits.
+        barrier = threading.Barrier(len(clients), timeout=10)
+        first_read = threading.local()
+
+        def read(trip_id):
+            version = get_inventory_version(trip_id)
+            if not getattr(first_read, "done", False):
+                first_read.done = True
+                barrier.wait()
+            return version
+
+        responses = []
+
+        def submit(client):
+            try:
+                responses.append(self.checkout(seat_ids, client))
+            finally:
+                connection.close()
+
+        with mock.patch.object(views, "get_inventory_version", read), \
+                mock.patch.object(views, "record_seat_conflict") as conflict:
+            threads = [threading.Thread(target=submit, args=(client,)) for client in clients]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(responses), 2)
+        self.assertFalse(barrier.broken)
+        # The loser failed the version swap, retried, and found its holds gone.
+        self.assertEqual(
+            [call.args[0] for call in conflict.call_args_list],
+            ["checkout_inventory_retry", "checkout_lock_expired"],
+        )
+        booking = Booking.objects.get(trip=self.trip)
+        self.assertEqual(sorted(booking.seats.values_list("seat_id", flat=True)), seat_ids)
+        self.assertEqual(
+            sorted(response["Location"] for response in responses),
+            sorted([
+                reverse("booking_success", args=[booking.id]),
+                reverse("select_seats", args=[self.trip.id]),
+            ]),
+        )
+
+
+class ReportJobQueueTests(TestCase):
+    def test_identical_requests_share_a_job(self):
+        job, created = queue_report_job("all_bookings", "csv")
+        again, created_again = queue_report_job("all_bookings", "csv")
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.id, job.id)
+        self.assertTrue(queue_report_job("all_bookings", "pdf")[1])
+
+    def test_failed_job_is_not_reused(self):
+        job, _ = queue_report_job("all_bookings", "csv")
+        ReportJob.objects.filter(id=job.id).update(status="FAILED")
+
+        self.assertNotEqual(queue_report_job("all_bookings", "csv")[0].id, job.id)
+
+    def test_claim_takes_the_oldest_queued_job_once(self):
+        first, _ = queue_report_job("all_bookings", "csv")
+        second, _ = queue_report_job("all_passengers", "csv")
+
+        self.assertEqual(claim_next_job(), first.id)
+        self.assertEqual(claim_next_job(), second.id)
+        self.assertIsNone(claim_next_job())
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), ("RUNNING", 1))
+
+    def test_stale_running_jobs_are_requeued_then_failed(self):
+        job, _ = queue_report_job("all_bookings", "csv")
+        stale = timezone.now() - timedelta(seconds=REPORT_JOB_STALE_SECONDS + 1)
+
+        for attempt, status in ((1, "QUEUED"), (2, "FAILED")):
+            self.assertEqual(claim_next_job(), job.id)
+            ReportJob.objects.filter(id=job.id).update(heartbeat_at=stale)
+            recover_stale_jobs()
+            job.refresh_from_db()
+            self.assertEqual((job.attempts, job.status), (attempt, status))
+
+    def test_fresh_running_job_is_left_alone(self):
+        job, _ = queue_report_job("all_bookings", "csv")
+        claim_next_job()
+
+        self.assertEqual(recover_stale_jobs(), (0, 0))
+        self.assertEqual(queue_report_job("all_bookings", "csv")[0].id, job.id)
+
+    def test_job_of_a_dead_worker_is_retried_within_its_attempts(self):
+        job, _ = queue_report_job("all_bookings", "csv")
+
+        claim_next_job()
+        self.assertEqual(retry_job(job.id, "Worker process died."), "QUEUED")
+        claim_next_job()
+        self.assertEqual(retry_job(job.id, "Worker process died."), "FAILED")
+        job.refresh_from_db()
+        self.assertEqual(job.error, "Worker process died.")
+
+
+class ReportRenderTests(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = Booking.objects.create(user=self.user, trip=self.trip, status="CONFIRMED", total_fare=1000)
+        Passenger.objects.bulk_create([
+            Passenger(booking=self.booking, seat_id=seat_id, name=f"Passenger {seat_id}", age=30, gender="Male")
+            for seat_id in self.seat_ids[:2]
+        ])
+
+    def test_passenger_csv_names_the_booking_by_pnr(self):
+        out = io.BytesIO()
+
+        with self.assertNumQueries(2):
+            total, _ = reports_pdf_views.render_report("all_passengers", "csv", out)
+
+        rows = list(csv.reader(io.StringIO(out.getvalue().decode())))
+        self.assertEqual(total, 2)
+        self.assertEqual(rows[0], ["ID", "Name", "Gender", "PNR"])
+        self.assertEqual({row[3] for row in rows[1:]}, {self.booking.pnr})
+
+    def test_pdf_chunks_are_merged(self):
+        out = io.BytesIO()
+        one_row_chunks = functools.partial(reports_pdf_views.iter_chunks, size=1)
+
+        with mock.patch.object(reports_pdf_views, "iter_chunks", one_row_chunks):
+            reports_pdf_views.render_report("all_passengers", "pdf", out)
+
+        out.seek(0)
+        self.assertEqual(len(PdfReader(out).pages), 2)
+
+    def test_oversized_pdf_is_refused(self):
+        with mock.patch.object(reports_pdf_views, "REPORT_PDF_MAX_ROWS", 1), \
+                self.assertRaisesMessage(ValueError, "download it as CSV"):
+            reports_pdf_views.render_report("all_passengers", "pdf", io.BytesIO())
@@ -0,0 +1,103 @@
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+from .models import Booking
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_ticket_storage():
+    """
+    Storage for rendered ticket PDFs, configured like an entry of STORAGES.
+    """
+    config = getattr(settings, "TICKET_PDF_STORAGE", {})
+    backend = config.get("BACKEND", "django.core.files.storage.FileSystemStorage")
+    options = config.get("OPTIONS", {"location": settings.MEDIA_ROOT / "tickets"})
+    return import_string(backend)(**options)
+
+
+def ticket_pdf_name(booking):
+    return f"{booking.pnr}-v{booking.version}.pdf"
+
+
+def ticket_etag(booking):
+    return f'"{booking.pnr}-v{booking.version}"'
+
+
+def ticket_queryset():
+    return Booking.objects.select_related(
+        "user", "trip", "trip__route", "trip__bus",
+        "trip__route__source", "trip__route__destination"
+    ).prefetch_related("passengers__seat", "seats")
+
+
+def render_ticket_html(booking):
+    return render_to_string("bookings/ticket.html", {"booking": booking})
+
+
+def render_ticket_pdf(booking):
+    """
+    Render and store the PDF for the booking's current version. Raises
+    ImportError when WeasyPrint is unavailable.
+    """
+    from weasyprint import HTML
+    pdf = HTML(string=render_ticket_html(booking)).write_pdf()
+
+    storage = get_ticket_storage()
+    name = ticket_pdf_name(booking)
+    saved = storage.save(name, ContentFile(pdf))
+    if saved != name:
+        # A concurrent render stored the same version first and the storage
+        # picked another name for ours; drop it so nothing is orphaned.
+        storage.delete(saved)
+    return pdf
+
+
+def open_cached_ticket_pdf(booking):
+    """
+    File object for an already rendered ticket, or None.
+    """
+    storage = get_ticket_storage()
+    name = ticket_pdf_name(booking)
+    try:
+        return storage.open(name, "rb")
+    except FileNotFoundError:
+        return None
+
+
+def invalidate_ticket_pdf(pnr, version):
+    """
+    Drop the stored PDF of a superseded booking version after commit.
+    """
+    name = f"{pnr}-v{version}.pdf"
+    transaction.on_commit(lambda: get_ticket_storage().delete(name))
+
+
+def _prerender(booking_id):
+    try:
+        booking = ticket_queryset().get(id=booking_id)
+        if open_cached_ticket_pdf(booking) is None:
+            render_ticket_pdf(booking)
+    except Exception:
+        logger.exception("Ticket pre-render failed for booking %s", booking_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_ticket_prerender(booking_id):
+    """
+    When TICKET_PDF_PRERENDER is on, render the ticket in a background thread
+    once the booking commits, so the first download is already a file read.
+    """
+    if getattr(settings, "TICKET_PDF_PRERENDER", False):
+        transaction.on_commit(
+            lambda: threading.Thread(target=_prerender, args=(booking_id,), daemon=True).start()
+        )
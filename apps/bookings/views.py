@@ -1,18 +1,43 @@
+import asyncio
+import json
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import transaction, IntegrityError
-from django.shortcuts import render, redirect, get_object_or_404
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.utils import timezone
-from django.http import HttpResponse, Http404
-from django.template.loader import render_to_string
-
-from apps.buses.models import Trip, Seat
-from .models import SeatLock, Booking, BookingSeat, Passenger
-from .services import get_unavailable_seat_ids
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+
+from apps.buses.layout import get_layout_version, get_seat_layout
+from apps.buses.models import Trip
+from apps.core.metrics import record_seat_conflict
+from apps.core.pagination import keyset_page
+from .models import Booking, BookingSeat, Passenger
+from .events import get_broker, publish_seat_event
+from .holds import get_hold_backend
+from .inventory import CHECKOUT_ATTEMPTS, InventoryConflict, advance_inventory_version, get_inventory_version
+from .rollups import record_booking_cancelled, record_booking_confirmed, refresh_locked_seats
+from .tickets import (
+    invalidate_ticket_pdf, open_cached_ticket_pdf, render_ticket_html, render_ticket_pdf,
+    schedule_ticket_prerender, ticket_etag, ticket_queryset,
+)
+from .services import (
+    get_unavailable_seat_ids, invalidate_unavailable_seats, hold_seats, SeatsUnavailable,
+    parse_passenger_details, get_availability_snapshot, unavailable_from_snapshot,
+    availability_etag,
+)
 
 LOCK_MINUTES = 8
+SSE_HEARTBEAT_SECONDS = 15
+HISTORY_PAGE_SIZE = 10
 
 
 @login_required
@@ -22,7 +47,7 @@ def select_seats_view(request, trip_id):
         id=trip_id, active=True
     )
 
-    seats = Seat.objects.filter(bus=trip.bus).order_by("deck", "row", "col")
+    seats = get_seat_layout(trip.bus_id)
     unavailable_ids = list(get_unavailable_seat_ids(trip))  # for template "in" checks
 
     if request.method == "POST":
@@ -32,6 +57,7 @@ def select_seats_view(request, trip_id):
                 "trip": trip,
                 "seats": seats,
                 "unavailable_ids": unavailable_ids,
+                "seat_events_enabled": settings.SEAT_EVENTS_ENABLED,
                 "error": "Please select at least one seat."
             })
 
@@ -39,48 +65,16 @@ def select_seats_view(request, trip_id):
         expires_at = timezone.now() + timedelta(minutes=LOCK_MINUTES)
 
         try:
-            with transaction.atomic():
-                now = timezone.now()
-
-                # Cleanup expired locks for this trip (optional but useful)
-                SeatLock.objects.filter(trip=trip, expires_at__lte=now).delete()
-
-                # Check if any selected seat is already locked by another user (not expired)
-                conflicting_locks = SeatLock.objects.select_for_update().filter(
-                    trip=trip,
-                    seat_id__in=selected_ids,
-                    expires_at__gt=now
-                ).exclude(user=request.user)
-
-                if conflicting_locks.exists():
-                    messages.error(request, "Some seats were just locked by someone else. Please select again.")
-                    return redirect("select_seats", trip_id=trip.id)
-
-                # Check if any selected seat is already booked (confirmed)
-                booked = BookingSeat.objects.select_for_update().filter(
-                    booking__trip=trip,
-                    booking__status="CONFIRMED",
-                    seat_id__in=selected_ids
-                )
-                if booked.exists():
-                    messages.error(request, "Some seats were just booked. Please select again.")
-                    return redirect("select_seats", trip_id=trip.id)
-
-                # Release user's old active locks for this trip (optional)
-                SeatLock.objects.filter(trip=trip, user=request.user).delete()
-
-                # Create locks for selected seats
-                for seat_id in selected_ids:
-                    SeatLock.objects.create(
-                        trip=trip,
-                        seat_id=seat_id,
-                        user=request.user,
-                        expires_at=expires_at
-                    )
-
-        except IntegrityError:
-            # Unique constraint hit (trip, seat) => someone locked simultaneously
-            messages.error(request, "One or more seats were locked at the same time by someone else. Try again.")
+            # All-or-nothing claim through the hold backend; expired holds on
+            # the requested seats are taken over.
+            hold_seats(trip, request.user, selected_ids, expires_at)
+        except SeatsUnavailable as exc:
+            record_seat_conflict("hold")
+            lost = [s.seat_number for s in seats if s.id in exc.seat_ids]
+            messages.error(
+                request,
+                f"Seats {', '.join(lost) or 'selected'} were just taken by someone else. Please select again."
+            )
             return redirect("select_seats", trip_id=trip.id)
 
         return redirect("checkout", trip_id=trip.id)
@@ -88,10 +82,175 @@ def select_seats_view(request, trip_id):
     return render(request, "buses/seat_select.html", {
         "trip": trip,
         "seats": seats,
-        "unavailable_ids": unavailable_ids
+        "unavailable_ids": unavailable_ids,
+        "seat_events_enabled": settings.SEAT_EVENTS_ENABLED,
     })
 
 
+@login_required
+@require_GET
+def seat_map_api_view(request, trip_id):
+    """
+    Seat layout and states as JSON for polling from seat.js.
+
+    The ETag comes from the cached availability snapshot and the bus's layout
+    version, so a client whose map is unchanged gets 304 without the trip or
+    any seat rows being loaded. Seats come from the per-bus layout cache.
+    The snapshot has no bus for a missing or inactive trip, which is a 404
+    whatever the client sends.
+    """
+    now = timezone.now()
+    snapshot = get_availability_snapshot(trip_id, now)
+    bus_id = snapshot.get("bus_id")
+    if bus_id is None:
+        raise Http404("No active trip matches the given query.")
+    layout_version = get_layout_version(bus_id)
+    etag = availability_etag(trip_id, snapshot, now, layout_version)
+
+    client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in client_etags or "*" in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        trip = get_object_or_404(Trip.objects.only("id", "bus_id"), id=trip_id, active=True)
+        unavailable_ids = unavailable_from_snapshot(snapshot, now)
+        if trip.bus_id != bus_id:
+            layout_version = get_layout_version(trip.bus_id)
+            etag = availability_etag(trip_id, snapshot, now, layout_version)
+        seats = get_seat_layout(trip.bus_id, layout_version)
+        response = JsonResponse({
+            "trip": trip.id,
+            "seats": [
+                {
+                    "id": seat.id,
+                    "number": seat.seat_number,
+                    "deck": seat.deck,
+                    "row": seat.row,
+                    "col": seat.col,
+                    "type": seat.seat_type,
+                    "available": seat.id not in unavailable_ids,
+                }
+                for seat in seats
+            ],
+        })
+
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@login_required
+async def seat_events_view(request, trip_id):
+    """
+    Server-sent events for a trip's seat changes (locked / released / booked).
+
+    Needs an ASGI server, signalled by SEAT_EVENTS_ENABLED: under WSGI Django
+    would drain the endless stream before sending a byte and pin the worker,
+    so the view answers 204 at once, which stops EventSource reconnecting and
+    leaves seat.js polling. The stream only waits on the in-process broker, so
+    an open connection holds no DB connection.
+    """
+    if not settings.SEAT_EVENTS_ENABLED:
+        return HttpResponse(status=204)
+    await aget_object_or_404(Trip, id=trip_id, active=True)
+    broker = get_broker()
+
+    async def stream():
+        async with broker.subscribe(trip_id) as queue:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _confirm_checkout(request, trip, passengers, backend):
+    """
+    One optimistic checkout attempt (see apps.bookings.inventory). Returns the
+    redirect to send; raises InventoryConflict, after rolling back, when
+    another booking for the trip committed since the attempt started.
+    """
+    with transaction.atomic():
+        version = get_inventory_version(trip.id)
+        now = timezone.now()
+
+        seat_ids = [hold.seat_id for hold in backend.active(trip.id, request.user.id, now)]
+        if not seat_ids:
+            record_seat_conflict("checkout_lock_expired")
+            messages.error(request, "Your seat lock expired. Please select seats again.")
+            return redirect("select_seats", trip_id=trip.id)
+
+        if not set(seat_ids) <= passengers.keys():
+            # Locks changed since the form was rendered (e.g. re-selected in another tab)
+            record_seat_conflict("checkout_selection_changed")
+            messages.error(request, "Your seat selection changed. Please review passenger details.")
+            return redirect("checkout", trip_id=trip.id)
+
+        # Re-check if any seat got booked (should not happen, but for safety).
+        # No row locks: a booking committed after the version read fails the swap below.
+        booked_ids = set(
+            BookingSeat.objects.filter(
+                booking__trip=trip,
+                booking__status="CONFIRMED",
+                seat_id__in=seat_ids
+            ).values_list("seat_id", flat=True)
+        )
+        if booked_ids:
+            record_seat_conflict("checkout_seats_booked")
+            backend.release(trip.id, request.user.id)
+            invalidate_unavailable_seats(trip.id)
+            publish_seat_event(trip.id, "released", set(seat_ids) - booked_ids)
+            refresh_locked_seats(trip.id)
+            messages.error(request, "Some seats were booked before confirmation. Please try again.")
+            return redirect("select_seats", trip_id=trip.id)
+
+        # Create booking
+        booking = Booking.objects.create(
+            user=request.user,
+            trip=trip,
+            status="CONFIRMED",
+            total_fare=trip.base_fare * len(seat_ids),
+        )
+
+        # Create seats & passengers: one INSERT each, whatever the party size
+        BookingSeat.objects.bulk_create([
+            BookingSeat(booking=booking, seat_id=seat_id, fare=trip.base_fare)
+            for seat_id in seat_ids
+        ])
+        Passenger.objects.bulk_create([
+            Passenger(booking=booking, seat_id=seat_id, **passengers[seat_id])
+            for seat_id in seat_ids
+        ])
+
+        # Every path that books seats must make this swap (see inventory.py).
+        # Everything below runs with the trip's inventory row locked, so keep it short.
+        advance_inventory_version(trip.id, version)
+
+        # Take the holds over for this booking. A concurrent submit of the same
+        # holds (double click, second tab) fails the version swap above, and on
+        # retry finds the seats booked or the holds gone.
+        if backend.consume(trip.id, request.user.id, seat_ids, now) != set(seat_ids):
+            transaction.set_rollback(True)
+            record_seat_conflict("checkout_lock_expired")
+            messages.error(request, "Your seat lock expired. Please select seats again.")
+            return redirect("select_seats", trip_id=trip.id)
+
+        invalidate_unavailable_seats(trip.id)
+        record_booking_confirmed(booking, len(seat_ids))
+        publish_seat_event(trip.id, "booked", seat_ids)
+        schedule_ticket_prerender(booking.id)
+
+    messages.success(request, "Booking confirmed!")
+    return redirect("booking_success", booking_id=booking.id)
+
+
 @login_required
 def checkout_view(request, trip_id):
     trip = get_object_or_404(
@@ -100,8 +259,10 @@ def checkout_view(request, trip_id):
     )
 
     now = timezone.now()
-    locks = SeatLock.objects.filter(trip=trip, user=request.user, expires_at__gt=now).select_related("seat")
-    locked_seats = [l.seat for l in locks]
+    backend = get_hold_backend()
+    holds = backend.active(trip.id, request.user.id, now)
+    held_ids = {hold.seat_id for hold in holds}
+    locked_seats = [seat for seat in get_seat_layout(trip.bus_id) if seat.id in held_ids]
 
     if not locked_seats:
         messages.info(request, "No seats locked. Please select seats again.")
@@ -110,80 +271,28 @@ def checkout_view(request, trip_id):
     total_fare = trip.base_fare * len(locked_seats)
 
     # show countdown label (optional)
-    earliest_expiry = min(l.expires_at for l in locks)
+    earliest_expiry = min(hold.expires_at for hold in holds)
     remaining_seconds = int((earliest_expiry - now).total_seconds())
     lock_expires_in = f"{max(0, remaining_seconds)//60}m {max(0, remaining_seconds)%60}s"
 
     if request.method == "POST":
         # Passenger details are posted as: name_<seat_id>, age_<seat_id>, gender_<seat_id>
+        # Validate everything before any row lock is taken.
         try:
-            with transaction.atomic():
-                now = timezone.now()
-
-                # Re-read locks with row locks to avoid race
-                locks_qs = SeatLock.objects.select_for_update().filter(
-                    trip=trip, user=request.user, expires_at__gt=now
-                ).select_related("seat")
-
-                locks_list = list(locks_qs)
-                if not locks_list:
-                    messages.error(request, "Your seat lock expired. Please select seats again.")
-                    return redirect("select_seats", trip_id=trip.id)
-
-                seat_ids = [l.seat_id for l in locks_list]
-
-                # Re-check if any seat got booked (should not happen, but for safety)
-                if BookingSeat.objects.select_for_update().filter(
-                    booking__trip=trip,
-                    booking__status="CONFIRMED",
-                    seat_id__in=seat_ids
-                ).exists():
-                    # release locks for user
-                    SeatLock.objects.filter(trip=trip, user=request.user).delete()
-                    messages.error(request, "Some seats were booked before confirmation. Please try again.")
-                    return redirect("select_seats", trip_id=trip.id)
-
-                # Create booking
-                booking = Booking.objects.create(
-                    user=request.user,
-                    trip=trip,
-                    status="CONFIRMED",
-                    total_fare=trip.base_fare * len(seat_ids),
-                )
-
-                # Create seats & passengers
-                for lock in locks_list:
-                    seat = lock.seat
-                    BookingSeat.objects.create(
-                        booking=booking,
-                        seat=seat,
-                        fare=trip.base_fare
-                    )
-
-                    name = request.POST.get(f"name_{seat.id}", "").strip()
-                    age = request.POST.get(f"age_{seat.id}", "").strip()
-                    gender = request.POST.get(f"gender_{seat.id}", "").strip()
-
-                    if not name or not age or not gender:
-                        raise ValueError("Missing passenger details.")
-
-                    Passenger.objects.create(
-                        booking=booking,
-                        seat=seat,               
-                        name=name,
-                        age=int(age),
-                        gender=gender
-                    )
-
-                # Clear locks after booking confirmed
-                SeatLock.objects.filter(trip=trip, user=request.user).delete()
-
+            passengers = parse_passenger_details(request.POST, [s.id for s in locked_seats])
         except ValueError:
             messages.error(request, "Please fill all passenger details.")
             return redirect("checkout", trip_id=trip.id)
 
-        messages.success(request, "Booking confirmed!")
-        return redirect("booking_success", booking_id=booking.id)
+        for _ in range(CHECKOUT_ATTEMPTS):
+            try:
+                return _confirm_checkout(request, trip, passengers, backend)
+            except InventoryConflict:
+                # Another checkout for this trip committed first; re-check against it.
+                record_seat_conflict("checkout_inventory_retry")
+        record_seat_conflict("checkout_busy")
+        messages.error(request, "Many people are booking this trip right now. Please try again.")
+        return redirect("checkout", trip_id=trip.id)
 
     return render(request, "bookings/checkout.html", {
         "trip": trip,
@@ -204,12 +313,34 @@ def booking_success_view(request, booking_id):
 
 @login_required
 def booking_history_view(request):
+    tab = "past" if request.GET.get("tab") == "past" else "upcoming"
+    today = timezone.localdate()
+
     bookings = (
         Booking.objects.filter(user=request.user)
         .select_related("trip", "trip__route", "trip__bus", "trip__route__source", "trip__route__destination")
-        .order_by("-created_at")
     )
-    return render(request, "bookings/history.html", {"bookings": bookings})
+    if tab == "past":
+        bookings = bookings.filter(trip__journey_date__lt=today)
+    else:
+        bookings = bookings.filter(trip__journey_date__gte=today)
+
+    cursor = request.GET.get("cursor")
+    bookings, next_cursor = keyset_page(bookings, cursor, page_size=HISTORY_PAGE_SIZE)
+
+    # Two batched queries for the whole page instead of two per booking.
+    prefetch_related_objects(
+        bookings,
+        Prefetch("seats", queryset=BookingSeat.objects.select_related("seat").order_by("seat__seat_number")),
+        Prefetch("passengers", queryset=Passenger.objects.select_related("seat").order_by("id")),
+    )
+
+    return render(request, "bookings/history.html", {
+        "bookings": bookings,
+        "tab": tab,
+        "is_first_page": not cursor,
+        "next_cursor": next_cursor,
+    })
 
 
 @login_required
@@ -234,10 +365,16 @@ def cancel_booking_view(request, booking_id):
                 messages.info(request, "Booking already updated.")
                 return redirect("booking_history")
 
+            invalidate_ticket_pdf(booking.pnr, booking.version)
             booking.status = "CANCELLED"
             booking.cancelled_at = timezone.now()
             booking.cancellation_reason = reason
+            booking.version += 1
             booking.save()
+            invalidate_unavailable_seats(booking.trip_id)
+            seat_ids = list(BookingSeat.objects.filter(booking=booking).values_list("seat_id", flat=True))
+            publish_seat_event(booking.trip_id, "released", seat_ids)
+            record_booking_cancelled(booking, len(seat_ids))
 
         messages.success(request, "Booking cancelled.")
         return redirect("booking_history")
@@ -250,12 +387,12 @@ def ticket_pdf_view(request, booking_id):
     """
     Generates downloadable PDF ticket using WeasyPrint.
     Install: pip install weasyprint
+
+    PDFs are rendered once per booking version and kept in the ticket
+    storage; repeat downloads are a file read, or a 304 when the ETag matches.
     """
     booking = get_object_or_404(
-        Booking.objects.select_related(
-            "trip", "trip__route", "trip__bus",
-            "trip__route__source", "trip__route__destination"
-        ).prefetch_related("passengers", "seats"),
+        Booking.objects.only("id", "pnr", "version", "user_id"),
         id=booking_id,
         user=request.user
     )
@@ -263,15 +400,25 @@ def ticket_pdf_view(request, booking_id):
     # If you only allow tickets for confirmed:
     # if booking.status != "CONFIRMED": raise Http404("Ticket not available")
 
-    html_string = render_to_string("bookings/ticket.html", {"booking": booking})
-
-    try:
-        from weasyprint import HTML
-        pdf = HTML(string=html_string).write_pdf()
-    except Exception as e:
-        # fallback: show HTML if PDF lib missing
-        return HttpResponse(html_string)
+    etag = ticket_etag(booking)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    cached = open_cached_ticket_pdf(booking)
+    if cached is not None:
+        response = FileResponse(cached, content_type="application/pdf")
+    else:
+        booking = get_object_or_404(ticket_queryset(), id=booking.id)
+        try:
+            pdf = render_ticket_pdf(booking)
+        except Exception:
+            # fallback: show HTML if PDF lib missing
+            return HttpResponse(render_ticket_html(booking))
+        response = HttpResponse(pdf, content_type="application/pdf")
 
-    response = HttpResponse(pdf, content_type="application/pdf")
     response["Content-Disposition"] = f'attachment; filename="ticket_{booking.pnr}.pdf"'
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
     return response
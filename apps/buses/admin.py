@@ -1,8 +1,32 @@
-from django.contrib import admin
+from datetime import timedelta
+
+from django.contrib import admin, messages
+from django.utils import timezone
 
 # Register your models here.
-from .models import Seat, Bus, Trip
+from .models import Seat, Bus, Trip, TripSchedule
+from .schedules import generate_trips
 
 admin.site.register(Seat)
 admin.site.register(Bus)
 admin.site.register(Trip)
+
+
+@admin.register(TripSchedule)
+class TripScheduleAdmin(admin.ModelAdmin):
+    list_display = ("bus", "route", "departure_time", "arrival_time", "weekdays", "base_fare", "active")
+    list_filter = ("active", "route")
+    list_select_related = ("bus", "route", "route__source", "route__destination")
+    actions = ["generate_next_90_days"]
+
+    @admin.action(description="Generate trips for the next 90 days")
+    def generate_next_90_days(self, request, queryset):
+        today = timezone.localdate()
+        counts = generate_trips(today, today + timedelta(days=90), queryset)
+        level = messages.WARNING if counts["conflicts"] else messages.SUCCESS
+        self.message_user(
+            request,
+            f"Inserted {counts['inserted']} trips; skipped {counts['skipped']} existing, "
+            f"{counts['conflicts']} conflicts.",
+            level,
+        )
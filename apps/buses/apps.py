@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BusesConfig(AppConfig):
     name = 'apps.buses'
+
+    def ready(self):
+        from . import layout, search  # noqa: F401  (connect cache invalidation signals)
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Seat
+
+# Buses whose layouts are kept per process; least recently used go first.
+SEAT_LAYOUT_CACHE_SIZE = getattr(settings, "SEAT_LAYOUT_CACHE_SIZE", 1024)
+
+# Attribute names match Seat so templates can use either.
+LayoutSeat = namedtuple("LayoutSeat", "id seat_number deck row col seat_type")
+
+_layouts = OrderedDict()  # bus_id -> (version, tuple of LayoutSeat)
+_layouts_lock = threading.Lock()
+
+
+def _version_key(bus_id):
+    return f"seat_layout:version:{bus_id}"
+
+
+def get_layout_version(bus_id):
+    """
+    Shared layout version for a bus, seeded from the clock like the seat
+    availability version so an evicted key never repeats an old number.
+    """
+    key = _version_key(bus_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_layout_version(bus_id):
+    with _layouts_lock:
+        _layouts.pop(bus_id, None)
+    try:
+        return cache.incr(_version_key(bus_id))
+    except ValueError:
+        cache.add(_version_key(bus_id), int(time.time() * 1000), None)
+        return cache.incr(_version_key(bus_id))
+
+
+def invalidate_seat_layout(bus_id):
+    """
+    Drop the bus's layout in every process once the transaction commits.
+    Call this after bulk seat writes, which skip the signals below.
+    """
+    transaction.on_commit(lambda: bump_layout_version(bus_id))
+
+
+def get_seat_layout(bus_id, version=None):
+    """
+    Seats of a bus ordered by deck, row and col, as a tuple of LayoutSeat.
+
+    Served from a process-local LRU; an entry is only used while it matches
+    the shared layout version, so a seat edit in any process is picked up.
+    """
+    if version is None:
+        version = get_layout_version(bus_id)
+
+    with _layouts_lock:
+        entry = _layouts.get(bus_id)
+        if entry is not None and entry[0] == version:
+            _layouts.move_to_end(bus_id)
+            return entry[1]
+
+    layout = tuple(
+        LayoutSeat._make(row)
+        for row in Seat.objects.filter(bus_id=bus_id)
+        .order_by("deck", "row", "col")
+        .values_list("id", "seat_number", "deck", "row", "col", "seat_type")
+    )
+
+    with _layouts_lock:
+        _layouts[bus_id] = (version, layout)
+        _layouts.move_to_end(bus_id)
+        while len(_layouts) > SEAT_LAYOUT_CACHE_SIZE:
+            _layouts.popitem(last=False)
+    return layout
+
+
+@receiver(post_save, sender=Seat)
+@receiver(post_delete, sender=Seat)
+def _seat_changed(sender, instance, **kwargs):
+    invalidate_seat_layout(instance.bus_id)
@@ -0,0 +1,118 @@
+import random
+import time
+from datetime import time as dtime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.buses.models import Bus, Trip
+from apps.buses.search import clear_route_map, search_trips
+from apps.core.models import City, Route
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark trips_list_view's search query against a synthetic dataset. "
+        "All seeded rows are rolled back when the run finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trips", type=int, default=100_000)
+        parser.add_argument("--cities", type=int, default=40)
+        parser.add_argument("--buses", type=int, default=500)
+        parser.add_argument("--days", type=int, default=60)
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        clear_route_map()
+
+    def run(self, options):
+        rng = random.Random(options["seed"])
+        today = timezone.localdate()
+
+        started = time.perf_counter()
+        cities = City.objects.bulk_create(
+            [City(name=f"bench-city-{i}") for i in range(options["cities"])]
+        )
+        routes = Route.objects.bulk_create([
+            Route(source=a, destination=b)
+            for a in cities for b in cities if a.id != b.id
+        ])
+        buses = Bus.objects.bulk_create([
+            Bus(operator_name=f"bench-op-{i % 25}", bus_number=f"BENCH-{i}",
+                bus_type="AC_SEATER", total_seats=40)
+            for i in range(options["buses"])
+        ])
+
+        # Trip i runs on bus i % B; the remaining index picks a unique
+        # (journey_date, departure_time) for that bus.
+        trips = []
+        for i in range(options["trips"]):
+            k = i // len(buses)
+            trips.append(Trip(
+                bus=buses[i % len(buses)],
+                route=rng.choice(routes),
+                journey_date=today + timedelta(days=k % options["days"]),
+                departure_time=dtime((k // options["days"]) % 24, (k // options["days"] // 24) % 60),
+                arrival_time=dtime(23, 59),
+                base_fare=rng.randint(300, 2000),
+                active=rng.random() > 0.05,
+            ))
+        Trip.objects.bulk_create(trips, batch_size=5000)
+        self.stdout.write(
+            f"Seeded {len(routes)} routes, {len(buses)} buses, {len(trips)} trips "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        clear_route_map()
+        pairs = [(r.source_id, r.destination_id) for r in routes]
+        search_trips(*pairs[0])  # warm the route map
+
+        timings = []
+        query_counts = []
+        rows = 0
+        for _ in range(options["queries"]):
+            source_id, destination_id = rng.choice(pairs)
+            journey_date = None
+            if rng.random() < 0.5:
+                journey_date = today + timedelta(days=rng.randrange(options["days"]))
+
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                rows += len(list(search_trips(source_id, destination_id, journey_date)))
+                timings.append((time.perf_counter() - t0) * 1000)
+            query_counts.append(len(ctx.captured_queries))
+
+        self.stdout.write(
+            f"{len(timings)} searches, {rows / len(timings):.1f} trips/result, "
+            f"{sum(query_counts) / len(query_counts):.2f} queries/search"
+        )
+        self.stdout.write(
+            f"latency ms: p50={percentile(timings, 50):.2f} "
+            f"p95={percentile(timings, 95):.2f} p99={percentile(timings, 99):.2f} "
+            f"max={max(timings):.2f}"
+        )
+
+        source_id, destination_id = pairs[0]
+        self.stdout.write("plan:\n" + search_trips(source_id, destination_id).explain())
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from apps.buses.layout import invalidate_seat_layout
+from apps.buses.models import Bus, Seat
+from apps.buses.seat_layouts import layout_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Create seat layouts for buses that have no seats yet, from the "
+        "template for each bus type. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bus", dest="bus_ids", type=int, action="append",
+                            help="Only this bus id (repeatable).")
+        parser.add_argument("--operator", help="Only buses of this operator_name.")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Seats per INSERT (default 5000).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be created without writing.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        buses = Bus.objects.filter(~Exists(Seat.objects.filter(bus=OuterRef("pk"))))
+        if options["bus_ids"]:
+            buses = buses.filter(id__in=options["bus_ids"])
+        if options["operator"]:
+            buses = buses.filter(operator_name=options["operator"])
+        # Materialized first: the NOT EXISTS filter must not see seats added below.
+        buses = list(buses.order_by("id").values_list("id", "bus_type", "total_seats"))
+
+        # Plain multi-row INSERTs: bulk_create spends most of its time building
+        # and compiling model instances that are never used again.
+        qn = connection.ops.quote_name
+        fields = [Seat._meta.get_field(name) for name in ("bus", "seat_number", "seat_type", "deck", "row", "col")]
+        batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, [None] * batch_size))
+        insert_sql = (
+            f"INSERT INTO {qn(Seat._meta.db_table)} "
+            f"({', '.join(qn(field.column) for field in fields)}) VALUES "
+        )
+        row_sql = f"({', '.join(['%s'] * len(fields))})"
+
+        started = time.perf_counter()
+        bus_count = seat_count = 0
+        pending = []
+
+        def flush():
+            nonlocal pending
+            if options["dry_run"]:
+                pending = []
+                return
+            with connection.cursor() as cursor:
+                for start in range(0, len(pending), batch_size):
+                    batch = pending[start:start + batch_size]
+                    cursor.execute(
+                        insert_sql + ", ".join([row_sql] * len(batch)),
+                        [value for row in batch for value in row],
+                    )
+            pending = []
+
+        with transaction.atomic():
+            for bus_id, bus_type, total_seats in buses:
+                if not total_seats:
+                    continue
+                pending.extend((bus_id, *seat) for seat in layout_for(bus_type, total_seats))
+                # Raw inserts skip the Seat signals, so drop cached layouts here.
+                if not options["dry_run"]:
+                    invalidate_seat_layout(bus_id)
+                bus_count += 1
+                seat_count += total_seats
+                if len(pending) >= batch_size:
+                    flush()
+            flush()
+
+        verb = "Would create" if options["dry_run"] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {seat_count} seats for {bus_count} buses "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.buses.models import TripSchedule
+from apps.buses.schedules import generate_trips
+
+
+class Command(BaseCommand):
+    help = (
+        "Expand active trip schedules into Trip rows for a date range "
+        "(default: today and the next 90 days). Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="First journey date (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="date_to", help="Last journey date (YYYY-MM-DD).")
+        parser.add_argument("--days", type=int, default=90,
+                            help="Days after --from when --to is not given (default 90).")
+        parser.add_argument("--bus", dest="bus_ids", type=int, action="append",
+                            help="Only schedules of this bus id (repeatable).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count what would be generated without writing.")
+
+    def handle(self, *args, **options):
+        date_from = parse_date(options["date_from"]) if options["date_from"] else timezone.localdate()
+        if options["date_to"]:
+            date_to = parse_date(options["date_to"])
+        elif date_from is not None:
+            date_to = date_from + timedelta(days=options["days"])
+        else:
+            date_to = None
+        if date_from is None or date_to is None or date_to < date_from:
+            raise CommandError("Invalid date range.")
+
+        schedules = TripSchedule.objects.all()
+        if options["bus_ids"]:
+            schedules = schedules.filter(bus_id__in=options["bus_ids"])
+
+        started = time.perf_counter()
+        counts = generate_trips(date_from, date_to, schedules, dry_run=options["dry_run"])
+
+        verb = "Would insert" if options["dry_run"] else "Inserted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {counts['inserted']} trips from {date_from} to {date_to}; "
+            f"skipped {counts['skipped']} existing, {counts['conflicts']} conflicts "
+            f"({time.perf_counter() - started:.2f}s)."
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0001_initial'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['route', 'active', 'journey_date', 'departure_time'], include=('bus', 'arrival_time', 'base_fare'), name='trip_search_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Expression indexes matching what icontains/istartswith compile to on
+# PostgreSQL (UPPER(col::text) LIKE ...), so bus search avoids sequential scans.
+# Other backends use the in-memory prefix index in apps.buses.search.
+TRIGRAM_INDEXES = {
+    "bus_operator_trgm_idx": "operator_name",
+    "bus_number_trgm_idx": "bus_number",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON buses_bus '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0003_bus_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:03
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0004_bus_search_trigram'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_time', models.TimeField()),
+                ('arrival_time', models.TimeField()),
+                ('weekdays', models.CharField(default='0123456', help_text='Days the trip runs: 0 = Monday .. 6 = Sunday, e.g. 01234 for weekdays.', max_length=7, validators=[django.core.validators.RegexValidator('^[0-6]{1,7}$', 'Use digits 0 (Monday) to 6 (Sunday).')])),
+                ('base_fare', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('valid_from', models.DateField(blank=True, null=True)),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='buses.bus')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='core.route')),
+            ],
+        ),
+    ]
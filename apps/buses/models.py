@@ -1,3 +1,4 @@
+from django.core.validators import RegexValidator
 from django.db import models
 from apps.core.models import Route
 
@@ -13,9 +14,31 @@ class Bus(models.Model):
     bus_type = models.CharField(max_length=20, choices=BUS_TYPES)
     total_seats = models.PositiveIntegerField()
 
+    # Review aggregates, maintained by apps.reviews.ratings in the same
+    # transaction as every Review change (recompute_bus_ratings fixes drift).
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0, db_index=True)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return f"{self.operator_name} ({self.bus_number})"
 
+    @property
+    def rating_histogram(self):
+        """[(stars, count, percent)] from 5 down to 1 stars."""
+        return [
+            (stars, count, round(count * 100 / self.rating_count) if self.rating_count else 0)
+            for stars, count in (
+                (5, self.rating_5), (4, self.rating_4), (3, self.rating_3),
+                (2, self.rating_2), (1, self.rating_1),
+            )
+        ]
+
 class Seat(models.Model):
     SEAT_TYPES = [("SEATER", "Seater"), ("SLEEPER", "Sleeper")]
     DECKS = [("LOWER", "Lower"), ("UPPER", "Upper")]
@@ -44,6 +67,39 @@ class Trip(models.Model):
 
     class Meta:
         unique_together = ("bus", "journey_date", "departure_time")
+        indexes = [
+            # trips_list_view: route + active + date range, ordered by date/time
+            models.Index(
+                fields=["route", "active", "journey_date", "departure_time"],
+                include=["bus", "arrival_time", "base_fare"],
+                name="trip_search_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.route} on {self.journey_date} ({self.bus.bus_number})"
+
+class TripSchedule(models.Model):
+    """
+    A recurring departure that generate_trips expands into Trip rows.
+    """
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name="schedules")
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="schedules")
+    departure_time = models.TimeField()
+    arrival_time = models.TimeField()
+    weekdays = models.CharField(
+        max_length=7,
+        default="0123456",
+        validators=[RegexValidator(r"^[0-6]{1,7}$", "Use digits 0 (Monday) to 6 (Sunday).")],
+        help_text="Days the trip runs: 0 = Monday .. 6 = Sunday, e.g. 01234 for weekdays.",
+    )
+    base_fare = models.DecimalField(max_digits=8, decimal_places=2)
+    valid_from = models.DateField(null=True, blank=True)
+    valid_until = models.DateField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+
+    def runs_on(self, day):
+        return str(day.weekday()) in self.weekdays
+
+    def __str__(self):
+        return f"{self.route} at {self.departure_time} ({self.bus.bus_number}, days {self.weekdays})"
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+
+from .models import Trip, TripSchedule
+
+# Buses whose existing trips are loaded into memory at a time.
+SCHEDULE_BUS_CHUNK = 200
+
+# Trips per INSERT statement (capped further by the backend's parameter limit).
+SCHEDULE_BATCH_SIZE = 2000
+
+_TRIP_COLUMNS = ("bus", "route", "journey_date", "departure_time", "arrival_time", "base_fare", "active")
+
+
+def _insert_trips(rows):
+    """
+    Insert trip rows, already adapted for the database, leaving any
+    (bus, journey_date, departure_time) that already exists untouched.
+    Returns the ids of the rows actually inserted.
+    """
+    ops = connection.ops
+    fields = [Trip._meta.get_field(name) for name in _TRIP_COLUMNS]
+    batch_size = min(SCHEDULE_BATCH_SIZE, ops.bulk_batch_size(fields, rows) or len(rows))
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+    sql = (
+        f"INSERT INTO {ops.quote_name(Trip._meta.db_table)} "
+        f"({', '.join(ops.quote_name(field.column) for field in fields)}) VALUES "
+    )
+
+    inserted = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                sql + ", ".join([row_sql] * len(batch))
+                + " ON CONFLICT (bus_id, journey_date, departure_time) DO NOTHING RETURNING id",
+                [value for row in batch for value in row],
+            )
+            inserted += [row[0] for row in cursor.fetchall()]
+    return inserted
+
+
+def generate_trips(date_from, date_to, schedules=None, dry_run=False):
+    """
+    Expand active schedules into Trip rows for every matching day in
+    [date_from, date_to].
+
+    Returns {"inserted", "skipped", "conflicts"}: skipped trips already exist
+    for the same route (so re-running is a no-op); conflicts are departures
+    whose (bus, journey_date, departure_time) is taken by another route or by
+    another schedule, and are left for an operator to resolve.
+    """
+    # Imported here: the rollup lives in bookings, which imports this app's models.
+    from apps.bookings.inventory import create_trip_inventory
+    from apps.bookings.rollups import create_trip_stats
+
+    if schedules is None:
+        schedules = TripSchedule.objects.all()
+    schedules = list(schedules.filter(active=True).order_by("bus_id", "id"))
+    counts = {"inserted": 0, "skipped": 0, "conflicts": 0}
+
+    bus_ids = sorted({schedule.bus_id for schedule in schedules})
+    for start in range(0, len(bus_ids), SCHEDULE_BUS_CHUNK):
+        chunk = set(bus_ids[start:start + SCHEDULE_BUS_CHUNK])
+        taken = {
+            (bus_id, day, departure): route_id
+            for bus_id, day, departure, route_id in Trip.objects.filter(
+                bus_id__in=chunk, journey_date__range=(date_from, date_to)
+            ).values_list("bus_id", "journey_date", "departure_time", "route_id").iterator(chunk_size=5000)
+        }
+
+        rows = []
+        adapt_date = connection.ops.adapt_datefield_value
+        for schedule in schedules:
+            if schedule.bus_id not in chunk:
+                continue
+            # Columns that are the same for every trip of the schedule, adapted once.
+            fixed = (
+                connection.ops.adapt_timefield_value(schedule.departure_time),
+                connection.ops.adapt_timefield_value(schedule.arrival_time),
+                connection.ops.adapt_decimalfield_value(schedule.base_fare),
+                True,
+            )
+            first = max(date_from, schedule.valid_from or date_from)
+            last = min(date_to, schedule.valid_until or date_to)
+            for offset in range((last - first).days + 1):
+                day = first + timedelta(days=offset)
+                if not schedule.runs_on(day):
+                    continue
+                key = (schedule.bus_id, day, schedule.departure_time)
+                if key in taken:
+                    counts["skipped" if taken[key] == schedule.route_id else "conflicts"] += 1
+                    continue
+                taken[key] = schedule.route_id
+                rows.append((schedule.bus_id, schedule.route_id, adapt_date(day), *fixed))
+
+        if dry_run or not rows:
+            counts["inserted"] += len(rows)
+            continue
+        with transaction.atomic():
+            trip_ids = _insert_trips(rows)
+            create_trip_stats(trip_ids)
+            create_trip_inventory(trip_ids)
+        counts["inserted"] += len(trip_ids)
+        # Rows another writer inserted between our read and the INSERT.
+        counts["conflicts"] += len(rows) - len(trip_ids)
+
+    return counts
@@ -0,0 +1,236 @@
+import bisect
+import re
+import threading
+import time
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.core.models import Route
+from .models import Bus, Trip
+
+# Days shown when no journey date is given (today .. today + N).
+DEFAULT_WINDOW_DAYS = 7
+
+# Upper bound on how stale another process's route map may get; saves and
+# deletes in this process refresh it immediately via the signals below.
+ROUTE_MAP_TTL = 300
+
+_route_map = None
+_route_map_loaded_at = 0.0
+_route_map_lock = threading.Lock()
+
+
+def _load_route_map():
+    return {
+        (source_id, destination_id): route_id
+        for route_id, source_id, destination_id in Route.objects.values_list(
+            "id", "source_id", "destination_id"
+        )
+    }
+
+
+def get_route_id(source_id, destination_id):
+    """
+    Route id for a city pair from the in-memory map, or None.
+    """
+    global _route_map, _route_map_loaded_at
+    route_map = _route_map
+    if route_map is None or time.monotonic() - _route_map_loaded_at > ROUTE_MAP_TTL:
+        with _route_map_lock:
+            if _route_map is route_map:
+                _route_map = _load_route_map()
+                _route_map_loaded_at = time.monotonic()
+            route_map = _route_map
+    return route_map.get((source_id, destination_id))
+
+
+def clear_route_map():
+    global _route_map
+    _route_map = None
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def _route_changed(sender, **kwargs):
+    clear_route_map()
+
+
+def search_trips(source_id, destination_id, journey_date=None, today=None):
+    """
+    Active trips for a city pair, ordered by date and departure time.
+
+    The route is resolved from the in-memory map, so the only query is the
+    Trip scan on (route, active, journey_date, departure_time).
+    """
+    try:
+        route_id = get_route_id(int(source_id), int(destination_id))
+    except (TypeError, ValueError):
+        return Trip.objects.none()
+    if route_id is None:
+        return Trip.objects.none()
+
+    qs = (
+        Trip.objects.filter(route_id=route_id, active=True)
+        .select_related("bus", "route", "route__source", "route__destination")
+        .order_by("journey_date", "departure_time")
+    )
+
+    if journey_date:
+        return qs.filter(journey_date=journey_date)
+
+    today = today or timezone.localdate()
+    return qs.filter(journey_date__range=(today, today + timedelta(days=DEFAULT_WINDOW_DAYS)))
+
+
+# Bus search. On PostgreSQL the icontains filters below are served by the
+# pg_trgm GIN indexes from migration 0004; elsewhere (SQLite, tests) an
+# in-memory prefix index over name words and bus numbers is used instead.
+
+# Same staleness bound as the route map; Bus saves/deletes here clear it at once.
+BUS_INDEX_TTL = 300
+
+# Most prefix-index candidates ranked per lookup.
+BUS_INDEX_MAX_CANDIDATES = 500
+
+# Match quality, best first: exact bus number, prefix of the whole name or
+# number, prefix of a word in the name, anything else the database matched.
+MATCH_EXACT, MATCH_PREFIX, MATCH_WORD, MATCH_OTHER = 3, 2, 1, 0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(text):
+    return " ".join(_TOKEN_RE.findall(text.lower()))
+
+
+class BusPrefixIndex:
+    """
+    Sorted (token, bus_id, quality) entries; a prefix lookup is a bisect plus
+    a scan over the matching run, so it does not touch the database.
+    """
+
+    def __init__(self, rows):
+        entries = []
+        self._numbers = {}
+        for bus_id, operator_name, bus_number in rows:
+            number = _normalize(bus_number).replace(" ", "")
+            name = _normalize(operator_name)
+            self._numbers[number] = bus_id
+            entries.append((number, bus_id, MATCH_PREFIX))
+            entries.append((name, bus_id, MATCH_PREFIX))
+            entries.extend((word, bus_id, MATCH_WORD) for word in name.split()[1:])
+        entries.sort()
+        self._keys = [entry[0] for entry in entries]
+        self._entries = entries
+
+    def lookup(self, query, limit=BUS_INDEX_MAX_CANDIDATES):
+        """
+        {bus_id: match quality} for buses with a token starting with ``query``.
+        """
+        prefix = _normalize(query)
+        if not prefix:
+            return {}
+        compact = prefix.replace(" ", "")
+        found = {}
+        if compact in self._numbers:
+            found[self._numbers[compact]] = MATCH_EXACT
+
+        for probe in {prefix, compact}:
+            position = bisect.bisect_left(self._keys, probe)
+            while position < len(self._entries) and len(found) < limit:
+                token, bus_id, quality = self._entries[position]
+                if not token.startswith(probe):
+                    break
+                if found.get(bus_id, -1) < quality:
+                    found[bus_id] = quality
+                position += 1
+        return found
+
+
+_bus_index = None
+_bus_index_loaded_at = 0.0
+_bus_index_lock = threading.Lock()
+
+
+def get_bus_index():
+    global _bus_index, _bus_index_loaded_at
+    index = _bus_index
+    if index is None or time.monotonic() - _bus_index_loaded_at > BUS_INDEX_TTL:
+        with _bus_index_lock:
+            if _bus_index is index:
+                _bus_index = BusPrefixIndex(
+                    Bus.objects.values_list("id", "operator_name", "bus_number").iterator(chunk_size=5000)
+                )
+                _bus_index_loaded_at = time.monotonic()
+            index = _bus_index
+    return index
+
+
+def clear_bus_index():
+    global _bus_index
+    _bus_index = None
+
+
+@receiver(post_save, sender=Bus)
+@receiver(post_delete, sender=Bus)
+def _bus_changed(sender, **kwargs):
+    clear_bus_index()
+
+
+def _matching_bus_types(query):
+    query = query.lower()
+    return [code for code, label in Bus.BUS_TYPES if query in label.lower() or query in code.lower()]
+
+
+def search_buses(query, limit=20, order="match"):
+    """
+    Buses matching ``query`` on operator name, bus number or bus type label,
+    best match first (ties broken by rating), or by rating when order="rating".
+    Returns a list of at most ``limit`` buses.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    bus_types = _matching_bus_types(query)
+    if connection.vendor == "postgresql":
+        matches = Q(operator_name__icontains=query) | Q(bus_number__icontains=query)
+        if bus_types:
+            matches |= Q(bus_type__in=bus_types)
+        quality = Case(
+            When(bus_number__iexact=query, then=Value(MATCH_EXACT)),
+            When(Q(bus_number__istartswith=query) | Q(operator_name__istartswith=query),
+                 then=Value(MATCH_PREFIX)),
+            When(operator_name__icontains=f" {query}", then=Value(MATCH_WORD)),
+            default=Value(MATCH_OTHER),
+            output_field=IntegerField(),
+        )
+        ordering = ["-rating_avg", "-rating_count", "id"]
+        if order != "rating":
+            ordering.insert(0, "-match")
+        return list(Bus.objects.filter(matches).annotate(match=quality).order_by(*ordering)[:limit])
+
+    found = get_bus_index().lookup(query)
+    if bus_types:
+        # Few distinct types: rank matches on the type label below name matches.
+        type_ids = Bus.objects.filter(bus_type__in=bus_types).order_by(
+            "-rating_avg", "-rating_count"
+        ).values_list("id", flat=True)[:BUS_INDEX_MAX_CANDIDATES]
+        for bus_id in type_ids:
+            found.setdefault(bus_id, MATCH_OTHER)
+    if not found:
+        return []
+
+    buses = list(Bus.objects.filter(id__in=list(found)[:BUS_INDEX_MAX_CANDIDATES]))
+    for bus in buses:
+        bus.match = found[bus.id]
+    if order == "rating":
+        key = lambda bus: (-bus.rating_avg, -bus.rating_count, bus.id)
+    else:
+        key = lambda bus: (-bus.match, -bus.rating_avg, -bus.rating_count, bus.id)
+    return sorted(buses, key=key)[:limit]
@@ -0,0 +1,50 @@
+"""
+Seat layout templates per Bus.BUS_TYPES entry.
+
+A template turns a seat count into (seat_number, seat_type, deck, row, col)
+tuples. Seater buses use 2+2 rows numbered A1..A4, B1..; sleeper buses use
+2+1 berths on two decks, numbered L1.. on the lower deck and U1.. upstairs.
+"""
+from math import ceil
+
+SEATER_COLS = 4
+SLEEPER_COLS = 3
+
+
+def _row_label(row):
+    # A..Z, then AA, AB, ... for very long buses.
+    label = ""
+    while row:
+        row, rem = divmod(row - 1, 26)
+        label = chr(65 + rem) + label
+    return label
+
+
+def seater_layout(total_seats, cols=SEATER_COLS):
+    seats = []
+    for index in range(total_seats):
+        row, col = divmod(index, cols)
+        seats.append((f"{_row_label(row + 1)}{col + 1}", "SEATER", "LOWER", row + 1, col + 1))
+    return seats
+
+
+def sleeper_layout(total_seats, cols=SLEEPER_COLS):
+    lower = ceil(total_seats / 2)
+    seats = []
+    for deck, prefix, count in (("LOWER", "L", lower), ("UPPER", "U", total_seats - lower)):
+        for index in range(count):
+            row, col = divmod(index, cols)
+            seats.append((f"{prefix}{index + 1}", "SLEEPER", deck, row + 1, col + 1))
+    return seats
+
+
+LAYOUT_TEMPLATES = {
+    "AC_SEATER": seater_layout,
+    "NONAC_SEATER": seater_layout,
+    "AC_SLEEPER": sleeper_layout,
+    "NONAC_SLEEPER": sleeper_layout,
+}
+
+
+def layout_for(bus_type, total_seats):
+    return LAYOUT_TEMPLATES[bus_type](total_seats)
@@ -1,3 +1,282 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.bookings.models import TripDailyStats, TripInventory
+from apps.core.models import City, Route
+from . import layout
+from .layout import get_layout_version, get_seat_layout
+from .models import Bus, Seat, Trip, TripSchedule
+from .schedules import generate_trips
+from .search import DEFAULT_WINDOW_DAYS, clear_bus_index, clear_route_map, search_buses, search_trips
+
+
+def create_bus(number, seats=40, operator_name="Test Travels", bus_type="AC_SEATER", rating_avg=0.0):
+    return Bus.objects.create(operator_name=operator_name, bus_number=number, bus_type=bus_type,
+                              total_seats=seats, rating_avg=rating_avg)
+
+
+def create_trip(bus, route, journey_date, departure=9, **fields):
+    return Trip.objects.create(bus=bus, route=route, journey_date=journey_date, departure_time=time(departure),
+                               arrival_time=time(23), base_fare=500, **fields)
+
+
+class SearchTripsTests(TestCase):
+    def setUp(self):
+        clear_route_map()
+        self.addCleanup(clear_route_map)
+        self.source = City.objects.create(name="Source")
+        self.destination = City.objects.create(name="Destination")
+        self.route = Route.objects.create(source=self.source, destination=self.destination)
+        self.bus = create_bus("TEST-1")
+        self.today = timezone.localdate()
+
+    def search(self, journey_date=None, source=None, destination=None):
+        return list(search_trips(source or self.source.id, destination or self.destination.id, journey_date,
+                                 today=self.today))
+
+    def test_window_lists_active_trips_in_order(self):
+        later = create_trip(self.bus, self.route, self.today + timedelta(days=1), departure=7)
+        first = create_trip(self.bus, self.route, self.today, departure=18)
+        create_trip(self.bus, self.route, self.today, departure=10, active=False)
+        create_trip(self.bus, self.route, self.today + timedelta(days=DEFAULT_WINDOW_DAYS + 1))
+        create_trip(self.bus, self.route, self.today - timedelta(days=1))
+        reverse = Route.objects.create(source=self.destination, destination=self.source)
+        create_trip(self.bus, reverse, self.today, departure=12)
+
+        self.assertEqual(self.search(), [first, later])
+
+    def test_journey_date_narrows_to_that_day(self):
+        create_trip(self.bus, self.route, self.today)
+        tomorrow = create_trip(self.bus, self.route, self.today + timedelta(days=1))
+
+        self.assertEqual(self.search(self.today + timedelta(days=1)), [tomorrow])
+
+    def test_unknown_or_malformed_cities_find_nothing(self):
+        create_trip(self.bus, self.route, self.today)
+
+        for source, destination in ((self.destination.id, self.source.id), ("x", self.destination.id)):
+            with self.subTest(source=source, destination=destination):
+                self.assertEqual(self.search(source=source, destination=destination), [])
+
+    def test_only_the_trip_query_runs_once_the_route_map_is_loaded(self):
+        create_trip(self.bus, self.route, self.today)
+        self.search()
+
+        with self.assertNumQueries(1):
+            self.search()
+
+    def test_new_route_is_found_without_waiting_for_the_map_to_expire(self):
+        self.search()
+        other = City.objects.create(name="Elsewhere")
+        route = Route.objects.create(source=self.source, destination=other)
+        trip = create_trip(self.bus, route, self.today)
+
+        self.assertEqual(self.search(destination=other.id), [trip])
+
+
+class SearchBusesTests(TestCase):
+    # Queries avoid mid-word matches, which only the PostgreSQL trigram path
+    # finds, so both backends must rank these the same way.
+    def setUp(self):
+        clear_bus_index()
+        self.addCleanup(clear_bus_index)
+        self.city = create_bus("KA-01", operator_name="City Express", rating_avg=3.0)
+        self.lines = create_bus("KA-02", operator_name="Express Lines", rating_avg=4.5)
+        self.night = create_bus("EXP-9", operator_name="Night Rider", bus_type="NONAC_SLEEPER", rating_avg=5.0)
+
+    def test_better_matches_rank_first(self):
+        cases = {
+            "KA-01": [self.city],
+            "ka": [self.lines, self.city],
+            "express": [self.lines, self.city],
+            "exp": [self.night, self.lines, self.city],
+            "sleeper": [self.night],
+            "nothing": [],
+            "  ": [],
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(search_buses(query), expected)
+
+    def test_rating_order_and_limit(self):
+        self.assertEqual(search_buses("express", order="rating"), [self.lines, self.city])
+        self.assertEqual(search_buses("exp", limit=2), [self.night, self.lines])
+
+    def test_new_bus_is_found_at_once(self):
+        self.assertEqual(search_buses("zoom"), [])
+
+        bus = create_bus("ZM-1", operator_name="Zoom Travels")
+
+        self.assertEqual(search_buses("zoom"), [bus])
+
+    def test_autocomplete_json(self):
+        response = self.client.get(reverse("bus_autocomplete"), {"q": "KA-01"})
+
+        self.assertEqual(response.json()["results"], [{
+            "id": self.city.id,
+            "operator_name": "City Express",
+            "bus_number": "KA-01",
+            "bus_type": "AC Seater",
+            "rating_avg": 3.0,
+            "rating_count": 0,
+            "url": reverse("bus_reviews", args=[self.city.id]),
+        }])
+
+
+class SeatLayoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        layout._layouts.clear()
+        self.addCleanup(layout._layouts.clear)
+        self.bus = create_bus("TEST-1")
+        Seat.objects.bulk_create([
+            Seat(bus=self.bus, seat_number=number, seat_type="SEATER", deck="LOWER", row=row, col=col)
+            for number, row, col in (("B1", 2, 1), ("A2", 1, 2), ("A1", 1, 1))
+        ])
+
+    def numbers(self, seats):
+        return [seat.seat_number for seat in seats]
+
+    def test_layout_is_ordered_and_cached(self):
+        self.assertEqual(self.numbers(get_seat_layout(self.bus.id)), ["A1", "A2", "B1"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.numbers(get_seat_layout(self.bus.id)), ["A1", "A2", "B1"])
+
+    def test_seat_edit_is_picked_up_after_commit(self):
+        version = get_layout_version(self.bus.id)
+        get_seat_layout(self.bus.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Seat.objects.filter(seat_number="B1").get().delete()
+
+        self.assertGreater(get_layout_version(self.bus.id), version)
+        self.assertEqual(self.numbers(get_seat_layout(self.bus.id)), ["A1", "A2"])
+
+    def test_entry_of_an_older_version_is_reloaded(self):
+        get_seat_layout(self.bus.id)
+        # Another process edited the bus: the shared version moved, the seats changed.
+        Seat.objects.filter(seat_number="B1").update(seat_number="B9")
+        cache.incr(layout._version_key(self.bus.id))
+
+        self.assertEqual(self.numbers(get_seat_layout(self.bus.id)), ["A1", "A2", "B9"])
+
+    def test_least_recently_used_bus_is_evicted(self):
+        buses = [self.bus, create_bus("TEST-2"), create_bus("TEST-3")]
+
+        with mock.patch.object(layout, "SEAT_LAYOUT_CACHE_SIZE", 2):
+            for bus in buses[:2]:
+                get_seat_layout(bus.id)
+            get_seat_layout(buses[0].id)
+            get_seat_layout(buses[2].id)
+
+        self.assertEqual(list(layout._layouts), [buses[0].id, buses[2].id])
+
+
+class GenerateSeatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(layout._layouts.clear)
+        self.seater = create_bus("TEST-1", seats=6)
+        self.sleeper = create_bus("TEST-2", seats=5, bus_type="AC_SLEEPER")
+        self.seated = create_bus("TEST-3", seats=4)
+        Seat.objects.create(bus=self.seated, seat_number="X1", seat_type="SEATER", row=1, col=1)
+
+    def generate(self, *args):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("generate_seats", *args, stdout=out)
+        return out.getvalue()
+
+    def seats(self, bus):
+        return list(Seat.objects.filter(bus=bus).order_by("deck", "row", "col")
+                    .values_list("seat_number", "seat_type", "deck", "row", "col"))
+
+    def test_fills_buses_without_seats_across_batches(self):
+        output = self.generate("--batch-size", "4")
+
+        self.assertIn("Created 11 seats for 2 buses", output)
+        self.assertEqual([seat[0] for seat in self.seats(self.seater)], ["A1", "A2", "A3", "A4", "B1", "B2"])
+        self.assertEqual(self.seats(self.sleeper), [
+            ("L1", "SLEEPER", "LOWER", 1, 1), ("L2", "SLEEPER", "LOWER", 1, 2), ("L3", "SLEEPER", "LOWER", 1, 3),
+            ("U1", "SLEEPER", "UPPER", 1, 1), ("U2", "SLEEPER", "UPPER", 1, 2),
+        ])
+        self.assertEqual([seat[0] for seat in self.seats(self.seated)], ["X1"])
+
+    def test_rerun_and_dry_run_write_nothing(self):
+        self.assertIn("Would create 11 seats for 2 buses", self.generate("--dry-run"))
+        self.assertEqual(Seat.objects.count(), 1)
+
+        self.generate()
+        self.assertIn("Created 0 seats for 0 buses", self.generate())
+        self.assertEqual(Seat.objects.count(), 12)
+
+    def test_filters_and_cached_layouts(self):
+        self.assertEqual(get_seat_layout(self.seater.id), ())
+
+        self.generate("--bus", str(self.seater.id))
+
+        self.assertEqual(len(get_seat_layout(self.seater.id)), 6)
+        self.assertEqual(self.seats(self.sleeper), [])
+
+
+class GenerateTripsTests(TestCase):
+    monday = date(2030, 1, 7)
+
+    def setUp(self):
+        self.bus = create_bus("TEST-1")
+        self.route = Route.objects.create(source=City.objects.create(name="Source"),
+                                          destination=City.objects.create(name="Destination"))
+        self.schedule = TripSchedule.objects.create(
+            bus=self.bus, route=self.route, departure_time=time(9), arrival_time=time(15), weekdays="02",
+            base_fare=Decimal("450.00"), valid_until=self.monday + timedelta(days=8),
+        )
+        TripSchedule.objects.create(bus=self.bus, route=self.route, departure_time=time(21), arrival_time=time(23),
+                                    base_fare=500, active=False)
+
+    def generate(self, **kwargs):
+        return generate_trips(self.monday, self.monday + timedelta(days=13), **kwargs)
+
+    def test_expands_weekdays_within_the_validity_window(self):
+        self.assertEqual(self.generate(), {"inserted": 3, "skipped": 0, "conflicts": 0})
+
+        trips = Trip.objects.order_by("journey_date")
+        self.assertEqual([trip.journey_date - self.monday for trip in trips],
+                         [timedelta(days=0), timedelta(days=2), timedelta(days=7)])
+        self.assertEqual({(trip.departure_time, trip.base_fare, trip.active) for trip in trips},
+                         {(time(9), Decimal("450.00"), True)})
+        trip_ids = {trip.id for trip in trips}
+        self.assertEqual(set(TripDailyStats.objects.values_list("trip_id", flat=True)), trip_ids)
+        self.assertEqual(set(TripInventory.objects.values_list("trip_id", flat=True)), trip_ids)
+
+    def test_rerun_and_dry_run_insert_nothing(self):
+        self.assertEqual(self.generate(dry_run=True), {"inserted": 3, "skipped": 0, "conflicts": 0})
+        self.assertFalse(Trip.objects.exists())
+
+        self.generate()
+        self.assertEqual(self.generate(), {"inserted": 0, "skipped": 3, "conflicts": 0})
+        self.assertEqual(Trip.objects.count(), 3)
+
+    def test_departure_taken_by_another_route_is_a_conflict(self):
+        other = Route.objects.create(source=self.route.destination, destination=self.route.source)
+        taken = create_trip(self.bus, other, self.monday + timedelta(days=2))
+
+        self.assertEqual(self.generate(), {"inserted": 2, "skipped": 0, "conflicts": 1})
+        taken.refresh_from_db()
+        self.assertEqual(taken.route, other)
+
+    def test_command_reports_the_counts(self):
+        out = StringIO()
+
+        call_command("generate_trips", "--from", str(self.monday), "--days", "13", stdout=out)
 
-# Create your tests here.
+        self.assertIn("Inserted 3 trips from 2030-01-07 to 2030-01-20; skipped 0 existing, 0 conflicts",
+                      out.getvalue())
@@ -1,9 +1,11 @@
 from django.urls import path
 from .views import search_view, trips_list_view
-from apps.bookings.views import select_seats_view
+from apps.bookings.views import select_seats_view, seat_map_api_view, seat_events_view
 
 urlpatterns = [
     path("", search_view, name="search"),
     path("trips/", trips_list_view, name="trips_list"),
     path("trips/<int:trip_id>/seats/", select_seats_view, name="select_seats"),
+    path("trips/<int:trip_id>/seats.json", seat_map_api_view, name="seat_map_api"),
+    path("trips/<int:trip_id>/seats/events/", seat_events_view, name="seat_events"),
 ]
\ No newline at end of file
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'apps.core'
+
+    def ready(self):
+        from .health import pool_metrics
+        from .metrics import register_collector
+
+        register_collector(pool_metrics)
@@ -0,0 +1,73 @@
+import time
+
+from django.db import connections
+
+
+def pool_stats(alias="default"):
+    """
+    Counters of the database's psycopg connection pool, or None when the
+    connection is not pooled (see DB_POOL in settings).
+    """
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    requests = stats.get("requests_num", 0)
+    return {
+        "min_size": stats.get("pool_min", 0),
+        "max_size": stats.get("pool_max", 0),
+        "size": stats.get("pool_size", 0),
+        "available": stats.get("pool_available", 0),
+        "in_use": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+        "requests_waiting": stats.get("requests_waiting", 0),
+        "requests": requests,
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_errors": stats.get("requests_errors", 0),
+        "avg_wait_ms": round(stats.get("requests_wait_ms", 0) / requests, 2) if requests else 0.0,
+        "connections_lost": stats.get("connections_lost", 0),
+    }
+
+
+def database_health(alias="default"):
+    """
+    Round-trip a trivial query and describe how connections are reused.
+    Raises whatever the database driver raises when it is unreachable.
+    """
+    connection = connections[alias]
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    round_trip_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    stats = pool_stats(alias)
+    health = {
+        "vendor": connection.vendor,
+        "round_trip_ms": round_trip_ms,
+        "mode": "pool" if stats is not None else "persistent" if connection.settings_dict["CONN_MAX_AGE"] else "per-request",
+        "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+        "health_checks": connection.settings_dict["CONN_HEALTH_CHECKS"],
+    }
+    if stats is not None:
+        health["pool"] = stats
+    return health
+
+
+def pool_metrics():
+    """
+    Prometheus lines for the default database pool (see apps.core.metrics).
+    """
+    stats = pool_stats()
+    if stats is None:
+        return []
+    lines = []
+    for key, kind, help_text in (
+        ("size", "gauge", "Open connections in the pool."),
+        ("in_use", "gauge", "Pool connections checked out by requests."),
+        ("requests_waiting", "gauge", "Requests waiting for a pool connection."),
+        ("requests", "counter", "Connections handed out by the pool."),
+        ("requests_errors", "counter", "Pool requests that timed out or failed."),
+    ):
+        name = f"db_pool_{key}" + ("_total" if kind == "counter" else "")
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {stats[key]}"]
+    return lines
@@ -0,0 +1,128 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Each server process keeps its own registry; under several gunicorn workers a
+scrape sees one worker's numbers, so scrape per worker or sum them outside.
+"""
+import bisect
+import threading
+
+# Request latency buckets in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        # Only the bucket the value falls in is touched; exposition makes them cumulative.
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for label_values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                labels = _format_labels((*self.labels, "le"), (*label_values, bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by URL name.", ("view", "method"),
+)
+REQUESTS = Counter(
+    "http_requests_total", "Responses by URL name and status code.", ("view", "method", "status"),
+)
+DB_QUERIES = Counter(
+    "db_queries_total", "Database queries issued while handling requests, by URL name.", ("view",),
+)
+DB_TIME = Counter(
+    "db_query_duration_seconds_total", "Time spent in database queries, by URL name.", ("view",),
+)
+SEAT_LOCK_CONFLICTS = Counter(
+    "seat_lock_conflicts_total",
+    "Seat holds or checkouts refused because seats or locks changed underneath.",
+    ("stage",),
+)
+
+REGISTRY = [REQUEST_LATENCY, REQUESTS, DB_QUERIES, DB_TIME, SEAT_LOCK_CONFLICTS]
+
+
+# Callables returning extra exposition lines, read at scrape time.
+COLLECTORS = []
+
+
+def register_collector(collector):
+    """
+    Add a callable that returns Prometheus text lines for values an app
+    already tracks (e.g. cache hit counters), so they cost nothing per request.
+    """
+    if collector not in COLLECTORS:
+        COLLECTORS.append(collector)
+    return collector
+
+
+def record_seat_conflict(stage):
+    SEAT_LOCK_CONFLICTS.inc(stage)
+
+
+def expose():
+    """
+    Prometheus text format for every registered metric and collector.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    for collector in COLLECTORS:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+
+from .metrics import DB_QUERIES, DB_TIME, REQUEST_LATENCY, REQUESTS
+
+# Any other method a client makes up is recorded as "other", so it cannot
+# mint new label values.
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE", "CONNECT"})
+
+
+class _QueryTimer:
+    """
+    connection.execute_wrapper hook counting queries and their wall time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unmatched>"
+    return match.view_name
+
+
+def _method_label(request):
+    return request.method if request.method in HTTP_METHODS else "other"
+
+
+class MetricsMiddleware:
+    """
+    Record per-URL-name latency, status counts, DB query count and DB time.
+
+    Place it first in MIDDLEWARE so the timing covers the whole stack. When the
+    chain runs async (under ASGI) requests are timed but queries, which run in
+    worker threads, are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _record(self, request, response, started, timer=None):
+        view = _view_name(request)
+        method = _method_label(request)
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view, method)
+        REQUESTS.inc(view, method, response.status_code)
+        if timer is not None:
+            DB_QUERIES.inc(view, amount=timer.count)
+            DB_TIME.inc(view, amount=timer.seconds)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self._record(request, response, started, timer)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, started)
+        return response
@@ -0,0 +1,52 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    (created_at, pk) from a cursor made by encode_cursor, or None if it is
+    missing or malformed (callers then start from the first page).
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of ``queryset`` newest first on (created_at, id), starting after
+    ``cursor``. Returns (items, next_cursor); next_cursor is None on the last page.
+
+    The position is a seek on an index ending in (created_at, id) rather than
+    an OFFSET, so page 500 costs the same as page 1.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        # The created_at__lte term gives the planner a plain range bound on the
+        # index; the OR only resolves ties on the same timestamp.
+        queryset = queryset.filter(
+            Q(created_at__lte=created_at),
+            Q(created_at__lt=created_at) | Q(id__lt=pk),
+        )
+
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    return items, encode_cursor(items[-1].created_at, items[-1].id)
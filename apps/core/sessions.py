@@ -0,0 +1,34 @@
+"""
+Cache-first session store that only writes when the data really changed.
+
+Sessions are read from the cache and fall back to the database (see
+django.contrib.sessions.backends.cached_db), so a logged-in request costs no
+session query on a cache hit. Django saves a session whenever it was marked
+modified, even if every value was set back to what it already held; this
+store compares against what was loaded and skips both the DB and cache write
+in that case.
+"""
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+class SessionStore(CachedDBStore):
+    _loaded_state = None
+
+    def _state(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._loaded_state = self._state(data)
+        return data
+
+    def save(self, must_create=False):
+        if (
+            not must_create
+            and self.session_key is not None
+            and self._loaded_state is not None
+            and self._state(self._session) == self._loaded_state
+        ):
+            return
+        super().save(must_create=must_create)
+        self._loaded_state = self._state(self._session)
@@ -1,3 +1,185 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.sessions.models import Session
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.bookings.models import ReportJob
+from . import views
+from .metrics import REQUESTS, Counter, Histogram
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .sessions import SessionStore
+
+
+class CursorTests(TestCase):
+    def test_round_trip(self):
+        created_at = timezone.now()
+
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+
+    def test_missing_or_malformed_cursor_starts_over(self):
+        for cursor in (None, "", "not-a-cursor", encode_cursor(timezone.now(), 1)[:-3], "w6g"):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+
+
+class KeysetPageTests(TestCase):
+    def create_jobs(self, timestamps):
+        jobs = ReportJob.objects.bulk_create([
+            ReportJob(report="all_bookings", dedup_key=f"job-{i}") for i in range(len(timestamps))
+        ])
+        for job, created_at in zip(jobs, timestamps):
+            job.created_at = created_at
+        ReportJob.objects.bulk_update(jobs, ["created_at"])
+        return jobs
+
+    def walk(self, page_size):
+        pages, cursor = [], None
+        while True:
+            items, cursor = keyset_page(ReportJob.objects.all(), cursor, page_size=page_size)
+            pages.append([job.id for job in items])
+            if cursor is None:
+                return pages
+
+    def test_empty_queryset(self):
+        self.assertEqual(keyset_page(ReportJob.objects.all()), ([], None))
+
+    def test_exactly_one_full_page_has_no_next_cursor(self):
+        now = timezone.now()
+        self.create_jobs([now - timedelta(minutes=i) for i in range(3)])
+
+        items, cursor = keyset_page(ReportJob.objects.all(), page_size=3)
+
+        self.assertEqual(len(items), 3)
+        self.assertIsNone(cursor)
+
+    def test_one_past_a_full_page_continues(self):
+        now = timezone.now()
+        jobs = self.create_jobs([now - timedelta(minutes=i) for i in range(4)])
+
+        self.assertEqual(self.walk(page_size=3), [[job.id for job in jobs[:3]], [jobs[3].id]])
+
+    def test_ties_on_created_at_are_split_by_id(self):
+        now = timezone.now()
+        # Five rows share one timestamp, so pages must break the tie on id.
+        jobs = self.create_jobs([now] * 5 + [now - timedelta(seconds=1)] * 2)
+        expected = sorted((job.id for job in jobs[:5]), reverse=True) + sorted(
+            (job.id for job in jobs[5:]), reverse=True
+        )
+
+        pages = self.walk(page_size=2)
+
+        self.assertEqual([job_id for page in pages for job_id in page], expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+    def test_malformed_cursor_returns_the_first_page(self):
+        now = timezone.now()
+        jobs = self.create_jobs([now - timedelta(minutes=i) for i in range(3)])
+
+        items, _ = keyset_page(ReportJob.objects.all(), "garbage", page_size=2)
+
+        self.assertEqual([job.id for job in items], [job.id for job in jobs[:2]])
+
+
+class HealthTests(TestCase):
+    def test_liveness_does_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get("/health/")
+
+        self.assertEqual(response.content, b"ok")
+
+    def test_readiness_reports_the_database(self):
+        response = self.client.get("/health/", {"ready": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "ok")
+        self.assertIn("round_trip_ms", response.json()["database"])
+
+    def test_unreachable_database_is_logged_not_returned(self):
+        error = OperationalError('could not connect to server at "db.internal" as user "booking"')
+
+        with mock.patch.object(views, "database_health", side_effect=error), \
+                self.assertLogs("apps.core.views", "ERROR") as logs:
+            response = self.client.get("/health/", {"ready": "1"})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {"status": "unavailable", "database": {"error": "unavailable"}})
+        self.assertIn("db.internal", "\n".join(logs.output))
+
+
+class MetricsTests(TestCase):
+    def test_counter_and_histogram_exposition(self):
+        counter = Counter("demo_total", "Demo.", ("kind",))
+        counter.inc('a"b')
+        counter.inc('a"b', amount=2)
+        histogram = Histogram("demo_seconds", "Demo.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+
+        self.assertEqual(counter.expose()[2:], ['demo_total{kind="a\\"b"} 3'])
+        self.assertEqual(histogram.expose()[2:], [
+            'demo_seconds_bucket{le="0.1"} 1',
+            'demo_seconds_bucket{le="1.0"} 2',
+            'demo_seconds_bucket{le="+Inf"} 3',
+            "demo_seconds_sum 5.55",
+            "demo_seconds_count 3",
+        ])
+
+    def test_unknown_methods_share_one_label(self):
+        before = dict(REQUESTS._values)
+
+        self.client.generic("BREW", "/health/")
+        self.client.generic("GET", "/health/")
+
+        changed = {key for key, value in REQUESTS._values.items() if value != before.get(key, 0)}
+        self.assertEqual({method for _, method, _ in changed}, {"other", "GET"})
+
+    @override_settings(METRICS_TOKEN="")
+    def test_open_only_in_debug_without_a_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+        response = self.client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE http_requests_total counter", response.content.decode())
+
+
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        session = SessionStore()
+        session["cart"] = [1, 2]
+        session.save()
+        self.key = session.session_key
+
+    def test_unchanged_session_is_not_written(self):
+        session = SessionStore(self.key)
+        session["cart"] = [1, 2]
+
+        self.assertTrue(session.modified)
+        with self.assertNumQueries(0), mock.patch.object(session._cache, "set") as cache_set:
+            session.save()
+        cache_set.assert_not_called()
+
+    def test_changed_session_is_written(self):
+        session = SessionStore(self.key)
+        session["cart"] = [3]
+        session.save()
+
+        self.assertEqual(SessionStore(self.key)["cart"], [3])
+        self.assertEqual(Session.objects.get(session_key=self.key).get_decoded(), {"cart": [3]})
+
+    def test_new_session_with_the_same_data_is_created(self):
+        session = SessionStore()
+        session["cart"] = [1, 2]
+        session.save()
+
+        self.assertNotEqual(session.session_key, self.key)
+        self.assertTrue(Session.objects.filter(session_key=session.session_key).exists())
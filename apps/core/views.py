@@ -3,7 +3,43 @@ from django.shortcuts import render
 # Create your views here.
 
 # apps/core/views.py
-from django.http import HttpResponse
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+
+from .health import database_health
+from .metrics import expose
+
+logger = logging.getLogger(__name__)
+
 
 def health(request):
-    return HttpResponse("ok", content_type="text/plain")
\ No newline at end of file
+    """
+    Liveness by default. With ?ready=1, a readiness check that round-trips
+    the database and reports connection pool usage; 503 when it is down.
+    """
+    if request.GET.get("ready") != "1":
+        return HttpResponse("ok", content_type="text/plain")
+    try:
+        database = database_health()
+    except DatabaseError:
+        # The driver's message can carry hosts and users; keep it in the logs.
+        logger.exception("Readiness check failed")
+        return JsonResponse({"status": "unavailable", "database": {"error": "unavailable"}}, status=503)
+    return JsonResponse({"status": "ok", "database": database})
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. When METRICS_TOKEN is set the scraper must
+    send it as a bearer token; without one the endpoint is only open in DEBUG.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token and not settings.DEBUG:
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse("Unauthorized", status=401, content_type="text/plain")
+    return HttpResponse(expose(), content_type="text/plain; version=0.0.4; charset=utf-8")
\ No newline at end of file
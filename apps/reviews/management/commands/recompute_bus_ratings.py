@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.reviews.ratings import recompute_bus_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized rating aggregates on Bus from the reviews "
+        "(backfill, or to correct drift after bulk edits)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("bus_ids", nargs="*", type=int, help="Only these buses (default: all).")
+
+    def handle(self, *args, **options):
+        changed = recompute_bus_ratings(options["bus_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Corrected rating aggregates on {changed} bus(es)."))
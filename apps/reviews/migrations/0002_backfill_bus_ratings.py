@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def backfill(apps, schema_editor):
+    Bus = apps.get_model("buses", "Bus")
+    Review = apps.get_model("reviews", "Review")
+
+    rows = Review.objects.values("bus_id").annotate(
+        count=Count("id"),
+        total=Sum("rating"),
+        **{f"r{stars}": Count("id", filter=Q(rating=stars)) for stars in range(1, 6)},
+    )
+    for row in rows:
+        Bus.objects.filter(id=row["bus_id"]).update(
+            rating_count=row["count"],
+            rating_sum=row["total"],
+            rating_avg=row["total"] / row["count"],
+            **{f"rating_{stars}": row[f"r{stars}"] for stars in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0003_bus_rating_aggregates'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
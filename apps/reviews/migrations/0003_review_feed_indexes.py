@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buses', '0003_bus_rating_aggregates'),
+        ('reviews', '0002_backfill_bus_ratings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['bus', '-created_at', '-id'], name='review_bus_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['bus', 'rating', '-created_at', '-id'], name='review_bus_stars_feed_idx'),
+        ),
+    ]
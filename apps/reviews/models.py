@@ -1,7 +1,10 @@
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from apps.buses.models import Bus
+from .ratings import apply_rating_change
 
 
 class Review(models.Model):
@@ -28,6 +31,36 @@ class Review(models.Model):
             models.UniqueConstraint(fields=["user", "bus"], name="unique_review_per_user_bus")
         ]
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination of a bus's feed, with and without a star filter.
+            models.Index(fields=["bus", "-created_at", "-id"], name="review_bus_feed_idx"),
+            models.Index(fields=["bus", "rating", "-created_at", "-id"], name="review_bus_stars_feed_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.bus.bus_number} - {self.rating}★ by {self.user}"
\ No newline at end of file
+        return f"{self.bus.bus_number} - {self.rating}★ by {self.user}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the Bus aggregates currently count for this review.
+        instance._counted = (instance.__dict__.get("bus_id"), instance.__dict__.get("rating"))
+        return instance
+
+    def save(self, *args, **kwargs):
+        old_bus_id, old_rating = getattr(self, "_counted", (None, None))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if old_bus_id == self.bus_id:
+                apply_rating_change(self.bus_id, old_rating, self.rating)
+            else:
+                apply_rating_change(old_bus_id, old_rating, None)
+                apply_rating_change(self.bus_id, None, self.rating)
+        self._counted = (self.bus_id, self.rating)
+
+
+@receiver(post_delete, sender=Review)
+def _review_deleted(sender, instance, **kwargs):
+    # Runs inside the deletion's transaction, including cascades from Bus/User.
+    old_bus_id, old_rating = getattr(instance, "_counted", (instance.bus_id, instance.rating))
+    apply_rating_change(old_bus_id, old_rating, None)
\ No newline at end of file
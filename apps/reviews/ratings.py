@@ -0,0 +1,85 @@
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+from apps.buses.models import Bus
+
+# Star values that have a rating_<n> counter on Bus.
+RATING_VALUES = range(1, 6)
+
+
+def apply_rating_change(bus_id, old_rating=None, new_rating=None):
+    """
+    Move one review's rating on a bus from ``old_rating`` to ``new_rating``
+    (None = no review) with a single UPDATE; run it inside the review's transaction.
+    """
+    if bus_id is None or old_rating == new_rating:
+        return
+    for rating in (old_rating, new_rating):
+        if rating is not None and rating not in RATING_VALUES:
+            raise ValueError(f"Rating must be between 1 and 5, got {rating!r}")
+
+    count_delta = (new_rating is not None) - (old_rating is not None)
+    sum_delta = (new_rating or 0) - (old_rating or 0)
+    updates = {
+        "rating_count": F("rating_count") + count_delta,
+        "rating_sum": F("rating_sum") + sum_delta,
+        # SET expressions see the pre-update row, so rebuild the average from the deltas.
+        "rating_avg": Case(
+            When(
+                Q(rating_count__gt=-count_delta),
+                then=Cast(F("rating_sum") + sum_delta, FloatField())
+                / Cast(F("rating_count") + count_delta, FloatField()),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    }
+    if old_rating is not None:
+        updates[f"rating_{old_rating}"] = F(f"rating_{old_rating}") - 1
+    if new_rating is not None:
+        updates[f"rating_{new_rating}"] = F(f"rating_{new_rating}") + 1
+
+    Bus.objects.filter(id=bus_id).update(**updates)
+
+
+def recompute_bus_ratings(bus_ids=None):
+    """
+    Rebuild the aggregates from Review rows in one grouped query. Returns the
+    number of buses whose stored values had drifted.
+    """
+    from .models import Review
+
+    reviews = Review.objects.all()
+    buses = Bus.objects.all()
+    if bus_ids is not None:
+        reviews = reviews.filter(bus_id__in=bus_ids)
+        buses = buses.filter(id__in=bus_ids)
+
+    stats = {
+        row["bus_id"]: row
+        for row in reviews.values("bus_id").annotate(
+            count=Count("id"),
+            total=Sum("rating"),
+            **{f"r{stars}": Count("id", filter=Q(rating=stars)) for stars in RATING_VALUES},
+        )
+    }
+
+    fields = ["rating_count", "rating_sum", "rating_avg"] + [f"rating_{s}" for s in RATING_VALUES]
+    changed = []
+    for bus in buses.only("id", *fields).iterator(chunk_size=1000):
+        row = stats.get(bus.id, {})
+        values = {
+            "rating_count": row.get("count", 0),
+            "rating_sum": row.get("total") or 0,
+            **{f"rating_{s}": row.get(f"r{s}", 0) for s in RATING_VALUES},
+        }
+        values["rating_avg"] = (
+            values["rating_sum"] / values["rating_count"] if values["rating_count"] else 0.0
+        )
+        if any(getattr(bus, name) != value for name, value in values.items()):
+            for name, value in values.items():
+                setattr(bus, name, value)
+            changed.append(bus)
+
+    Bus.objects.bulk_update(changed, fields, batch_size=500)
+    return len(changed)
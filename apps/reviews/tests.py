@@ -1,3 +1,142 @@
+from datetime import time
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.buses.models import Bus, Trip
+from apps.core.models import City, Route
+from .models import Review
+from .ratings import apply_rating_change, recompute_bus_ratings
+
+RATING_FIELDS = ["rating_count", "rating_sum", "rating_avg"] + [f"rating_{stars}" for stars in range(1, 6)]
+
+
+def create_bus(number):
+    return Bus.objects.create(operator_name="Test Travels", bus_number=number, bus_type="AC_SEATER",
+                              total_seats=40)
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.bus = create_bus("TEST-1")
+        self.users = [
+            get_user_model().objects.create_user(username=f"rider{i}", password="pass") for i in range(3)
+        ]
+
+    def ratings(self, bus=None):
+        return Bus.objects.values(*RATING_FIELDS).get(id=(bus or self.bus).id)
+
+    def expected(self, *stars):
+        counts = {f"rating_{n}": stars.count(n) for n in range(1, 6)}
+        return {
+            "rating_count": len(stars),
+            "rating_sum": sum(stars),
+            "rating_avg": sum(stars) / len(stars) if stars else 0.0,
+            **counts,
+        }
+
+    def test_new_reviews_are_counted(self):
+        for user, stars in zip(self.users, (5, 4, 4)):
+            Review.objects.create(user=user, bus=self.bus, rating=stars)
+
+        self.assertEqual(self.ratings(), self.expected(5, 4, 4))
+
+    def test_changed_rating_moves_between_buckets(self):
+        review = Review.objects.create(user=self.users[0], bus=self.bus, rating=2)
+        Review.objects.create(user=self.users[1], bus=self.bus, rating=5)
+
+        review = Review.objects.get(id=review.id)
+        review.rating = 4
+        review.save()
+
+        self.assertEqual(self.ratings(), self.expected(4, 5))
+
+    def test_update_or_create_counts_a_review_once(self):
+        for stars in (3, 1):
+            Review.objects.update_or_create(user=self.users[0], bus=self.bus, defaults={"rating": stars})
+
+        self.assertEqual(self.ratings(), self.expected(1))
+
+    def test_review_moved_to_another_bus(self):
+        other = create_bus("TEST-2")
+        review = Review.objects.create(user=self.users[0], bus=self.bus, rating=3)
+
+        review.bus = other
+        review.save()
+
+        self.assertEqual(self.ratings(), self.expected())
+        self.assertEqual(self.ratings(other), self.expected(3))
+
+    def test_deleted_review_is_removed(self):
+        review = Review.objects.create(user=self.users[0], bus=self.bus, rating=5)
+        Review.objects.create(user=self.users[1], bus=self.bus, rating=1)
+
+        review.delete()
+
+        self.assertEqual(self.ratings(), self.expected(1))
+
+    def test_recompute_finds_no_drift_after_changes(self):
+        first = Review.objects.create(user=self.users[0], bus=self.bus, rating=2)
+        Review.objects.create(user=self.users[1], bus=self.bus, rating=5)
+        first.rating = 3
+        first.save()
+
+        self.assertEqual(recompute_bus_ratings(), 0)
+
+    def test_recompute_repairs_drift(self):
+        Review.objects.create(user=self.users[0], bus=self.bus, rating=4)
+        Bus.objects.filter(id=self.bus.id).update(rating_count=7, rating_4=0)
+
+        self.assertEqual(recompute_bus_ratings([self.bus.id]), 1)
+        self.assertEqual(self.ratings(), self.expected(4))
+
+    def test_out_of_range_rating_is_rejected(self):
+        Review.objects.create(user=self.users[0], bus=self.bus, rating=4)
+
+        for old, new in ((None, 6), (None, 0), (4, 6), (6, None)):
+            with self.subTest(old=old, new=new), self.assertRaises(ValueError):
+                apply_rating_change(self.bus.id, old, new)
+        self.assertEqual(self.ratings(), self.expected(4))
+
+
+class AddReviewViewTests(TestCase):
+    def setUp(self):
+        self.bus = create_bus("TEST-1")
+        route = Route.objects.create(
+            source=City.objects.create(name="Source"), destination=City.objects.create(name="Destination"),
+        )
+        trip = Trip.objects.create(bus=self.bus, route=route, journey_date=timezone.localdate(),
+                                   departure_time=time(9), arrival_time=time(15), base_fare=500)
+        self.user = get_user_model().objects.create_user(username="rider", password="pass")
+        Booking.objects.create(user=self.user, trip=trip, status="CONFIRMED", total_fare=500)
+        self.client.force_login(self.user)
+        self.url = reverse("add_review", args=[self.bus.id])
+
+    def test_valid_rating_is_saved(self):
+        response = self.client.post(self.url, {"rating": "4", "comment": "On time"})
+
+        self.assertRedirects(response, reverse("bus_reviews", args=[self.bus.id]), fetch_redirect_response=False)
+        self.assertEqual(Review.objects.get(user=self.user, bus=self.bus).rating, 4)
+        self.bus.refresh_from_db()
+        self.assertEqual((self.bus.rating_count, self.bus.rating_4), (1, 1))
+
+    def test_invalid_rating_is_a_form_error(self):
+        for rating in ("6", "0", "-1", "4.5", "five"):
+            with self.subTest(rating=rating):
+                response = self.client.post(self.url, {"rating": rating}, follow=True)
+
+                self.assertRedirects(response, self.url)
+                self.assertContains(response, "Rating must be a whole number from 1 to 5.")
+        self.assertFalse(Review.objects.exists())
+        self.bus.refresh_from_db()
+        self.assertEqual(self.bus.rating_count, 0)
+
+    def test_review_needs_a_confirmed_booking(self):
+        Booking.objects.update(status="CANCELLED")
+
+        self.client.post(self.url, {"rating": "5"})
 
-# Create your tests here.
+        self.assertFalse(Review.objects.exists())
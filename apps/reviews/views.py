@@ -1,41 +1,74 @@
 # reviews/views.py
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Avg, Count
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_GET
 
 from apps.buses.models import Bus
+from apps.buses.search import search_buses
 from apps.bookings.models import Booking
+from apps.core.pagination import keyset_page
 from .models import Review
+from .ratings import RATING_VALUES
+
+SEARCH_RESULTS_LIMIT = 100
+AUTOCOMPLETE_LIMIT = 8
 
 
 def bus_select(request):
     q = request.GET.get("q", "").strip()
-
-    buses = Bus.objects.all().order_by("operator_name", "bus_number")
+    sort = request.GET.get("sort", "")
 
     if q:
-        buses = buses.filter(
-            Q(operator_name__icontains=q) |
-            Q(bus_number__icontains=q) |
-            Q(bus_type__icontains=q)
-        )
-
-    return render(request, "reviews/bus_select.html", {"buses": buses})
+        buses = search_buses(q, limit=SEARCH_RESULTS_LIMIT, order="rating" if sort == "rating" else "match")
+    elif sort == "rating":
+        buses = Bus.objects.order_by("-rating_avg", "-rating_count", "bus_number")
+    else:
+        buses = Bus.objects.order_by("operator_name", "bus_number")
+
+    return render(request, "reviews/bus_select.html", {"buses": buses, "sort": sort})
+
+
+@require_GET
+def bus_autocomplete_view(request):
+    """
+    JSON suggestions for the bus search box, best match first then by rating.
+    """
+    buses = search_buses(request.GET.get("q", ""), limit=AUTOCOMPLETE_LIMIT)
+    return JsonResponse({
+        "results": [
+            {
+                "id": bus.id,
+                "operator_name": bus.operator_name,
+                "bus_number": bus.bus_number,
+                "bus_type": bus.get_bus_type_display(),
+                "rating_avg": round(bus.rating_avg, 1),
+                "rating_count": bus.rating_count,
+                "url": reverse("bus_reviews", args=[bus.id]),
+            }
+            for bus in buses
+        ]
+    })
 
 
 def bus_reviews_view(request, bus_id):
     bus = get_object_or_404(Bus, id=bus_id)
 
-    reviews = (
-        Review.objects.filter(bus=bus)
-        .select_related("user")
-        .order_by("-created_at")
-    )
+    reviews = Review.objects.filter(bus=bus).select_related("user")
 
-    stats = reviews.aggregate(avg=Avg("rating"), total=Count("id"))
-    average_rating = round(stats["avg"] or 0, 1)
-    total_reviews = stats["total"] or 0
+    stars = request.GET.get("stars", "")
+    stars = int(stars) if stars in {"1", "2", "3", "4", "5"} else None
+    if stars:
+        reviews = reviews.filter(rating=stars)
+
+    cursor = request.GET.get("cursor")
+    reviews, next_cursor = keyset_page(reviews, cursor)
+
+    # Read from the aggregates kept on Bus instead of scanning every review.
+    average_rating = round(bus.rating_avg, 1)
+    total_reviews = bus.rating_count
 
     return render(
         request,
@@ -45,6 +78,11 @@ def bus_reviews_view(request, bus_id):
             "reviews": reviews,
             "average_rating": average_rating,
             "total_reviews": total_reviews,
+            "histogram": bus.rating_histogram,
+            "stars": stars,
+            "matching_reviews": getattr(bus, f"rating_{stars}") if stars else total_reviews,
+            "is_first_page": not cursor,
+            "next_cursor": next_cursor,
         },
     )
 
@@ -72,10 +110,18 @@ def add_review_view(request, bus_id):
             messages.error(request, "Rating is required.")
             return redirect("add_review", bus_id=bus.id)
 
+        try:
+            rating = int(rating)
+        except ValueError:
+            rating = None
+        if rating not in RATING_VALUES:
+            messages.error(request, "Rating must be a whole number from 1 to 5.")
+            return redirect("add_review", bus_id=bus.id)
+
         Review.objects.update_or_create(
             user=request.user,
             bus=bus,
-            defaults={"rating": int(rating), "comment": comment},
+            defaults={"rating": rating, "comment": comment},
         )
 
         messages.success(request, "Review submitted.")
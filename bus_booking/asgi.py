@@ -3,6 +3,10 @@ ASGI config for bus_booking project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live seat stream (``seat_events_view``) is an async view and needs an
+ASGI server, e.g. ``gunicorn bus_booking.asgi:application -k uvicorn.workers.UvicornWorker``;
+set SEAT_EVENTS_ENABLED=True when serving through this module.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
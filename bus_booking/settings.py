@@ -59,6 +59,7 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 
 MIDDLEWARE = [
+    'apps.core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -100,6 +101,19 @@ if db_host not in ("localhost", "127.0.0.1"):
     DB_OPTIONS = {"sslmode": "require"}  # Supabase needs SSL
 
 
+# Connection reuse. By default each worker keeps its connection for
+# DB_CONN_MAX_AGE seconds (checked before reuse) instead of paying a TLS
+# handshake per request. DB_POOL=True switches to Django's built-in pool,
+# which also covers ASGI, where persistent connections are not reused; it
+# needs psycopg 3 (`pip install "psycopg[binary,pool]"`).
+DB_POOL = os.environ.get("DB_POOL", "False") == "True"
+DB_POOL_OPTIONS = {
+    "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+    "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),  # seconds to wait for a free connection
+    "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", "1800")),
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -110,11 +124,73 @@ DATABASES = {
         "PORT": os.environ.get("DB_PORT", "5432"),
         "OPTIONS": {
             "sslmode": "require",  # Supabase uses SSL
+            **({"pool": DB_POOL_OPTIONS} if DB_POOL else {}),
         },
+        # The pool manages connection lifetime itself and requires 0 here.
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
 
+# Cache
+# Seat availability snapshots live here. Use a shared backend (REDIS_URL) when
+# running more than one worker process so invalidations reach every worker.
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "bus-booking",
+        },
+        "sessions": {
+            "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+        },
+    }
+
+# Sessions are read from the cache first, written through to the DB, and only
+# saved when their data changed (apps/core/sessions.py). The cache must be
+# shared by every worker or a logout would not reach the others, so without
+# REDIS_URL the session cache is a no-op and sessions are read from the DB.
+SESSION_ENGINE = "apps.core.sessions"
+SESSION_CACHE_ALIAS = "default" if REDIS_URL else "sessions"
+
+# Flash messages ride in a signed cookie so redirects never touch the session.
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+SEAT_AVAILABILITY_CACHE_TIMEOUT = int(os.environ.get("SEAT_AVAILABILITY_CACHE_TIMEOUT", "300"))
+SEATS_LEFT_CACHE_TIMEOUT = int(os.environ.get("SEATS_LEFT_CACHE_TIMEOUT", "15"))
+
+# Buses whose compact seat layouts each process keeps in its LRU cache.
+SEAT_LAYOUT_CACHE_SIZE = int(os.environ.get("SEAT_LAYOUT_CACHE_SIZE", "1024"))
+
+# Pub/sub behind the seat SSE stream (served only under ASGI, see asgi.py).
+SEAT_EVENT_BROKER = "apps.bookings.events.InProcessSeatEventBroker"
+
+# Set when the site runs under an ASGI server. Under WSGI the live seat stream
+# would tie up a worker per open seat page, so it is off and pages poll instead.
+SEAT_EVENTS_ENABLED = os.environ.get("SEAT_EVENTS_ENABLED", "False") == "True"
+
+# Where seat holds live. CacheSeatHoldBackend keeps them in Redis at
+# SEAT_HOLD_REDIS_URL and refuses competing holds without touching PostgreSQL;
+# without a Redis URL it falls back to the default cache, which only works
+# while a single process serves requests.
+SEAT_HOLD_BACKEND = os.environ.get("SEAT_HOLD_BACKEND", "apps.bookings.holds.DatabaseSeatHoldBackend")
+SEAT_HOLD_REDIS_URL = os.environ.get("SEAT_HOLD_REDIS_URL") or REDIS_URL
+
+# Bearer token required by the Prometheus /metrics endpoint (empty = open in
+# DEBUG only, forbidden otherwise).
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -158,4 +234,20 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
 MEDIA_URL = "media/"
-MEDIA_ROOT = BASE_DIR / "media"
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Rendered ticket PDFs, cached per booking version. Same shape as a STORAGES
+# entry, so any Django storage backend can be plugged in.
+TICKET_PDF_STORAGE = {
+    "BACKEND": "django.core.files.storage.FileSystemStorage",
+    "OPTIONS": {"location": MEDIA_ROOT / "tickets"},
+}
+
+# Finished admin report files (written by `manage.py run_report_workers`).
+REPORT_STORAGE = {
+    "BACKEND": "django.core.files.storage.FileSystemStorage",
+    "OPTIONS": {"location": MEDIA_ROOT / "reports"},
+}
+
+# Render the ticket in the background as soon as a booking is confirmed.
+TICKET_PDF_PRERENDER = os.environ.get("TICKET_PDF_PRERENDER", "False") == "True"
\ No newline at end of file
@@ -1,11 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 
-from apps.core.views import health
+from apps.core.views import health, metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("health/", health),
+    path("metrics", metrics),
     path("", include("apps.buses.urls")),
     path("bookings/", include("apps.bookings.urls")),
     path("accounts/", include("apps.accounts.urls")),
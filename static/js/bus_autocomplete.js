@@ -0,0 +1,55 @@
+(function () {
+  const input = document.getElementById("busSearch");
+  const box = document.getElementById("busSuggestions");
+
+  if (!input || !box) return;
+
+  const DEBOUNCE_MS = 150;
+  let timer = null;
+  let controller = null;
+
+  function hide() {
+    box.classList.add("d-none");
+    box.textContent = "";
+  }
+
+  function render(results) {
+    box.textContent = "";
+    results.forEach(bus => {
+      const link = document.createElement("a");
+      link.href = bus.url;
+      link.className = "list-group-item list-group-item-action d-flex justify-content-between";
+
+      const name = document.createElement("span");
+      name.textContent = `${bus.operator_name} (${bus.bus_number}) · ${bus.bus_type}`;
+      const rating = document.createElement("span");
+      rating.className = "text-muted small";
+      rating.textContent = bus.rating_count ? `${bus.rating_avg} ★ (${bus.rating_count})` : "No ratings";
+
+      link.append(name, rating);
+      box.appendChild(link);
+    });
+    box.classList.toggle("d-none", !results.length);
+  }
+
+  function lookup() {
+    const q = input.value.trim();
+    if (!q) return hide();
+
+    // Only the latest keystroke's response matters.
+    if (controller) controller.abort();
+    controller = new AbortController();
+
+    fetch(`${input.dataset.autocompleteUrl}?q=${encodeURIComponent(q)}`, { signal: controller.signal })
+      .then(res => res.ok ? res.json() : { results: [] })
+      .then(data => render(data.results))
+      .catch(() => {});
+  }
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(lookup, DEBOUNCE_MS);
+  });
+  input.addEventListener("keydown", e => { if (e.key === "Escape") hide(); });
+  document.addEventListener("click", e => { if (!box.contains(e.target) && e.target !== input) hide(); });
+})();
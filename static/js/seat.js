@@ -1,31 +1,125 @@
 (function () {
-  const checks = document.querySelectorAll(".seat-check");
+  const grid = document.getElementById("seatGrid");
   const baseFareEl = document.getElementById("baseFare");
   const totalFareEl = document.getElementById("totalFare");
   const selectedSeatsText = document.getElementById("selectedSeatsText");
 
-  if (!checks || !baseFareEl || !totalFareEl || !selectedSeatsText) return;
+  if (!grid || !baseFareEl || !totalFareEl || !selectedSeatsText) return;
 
   const baseFare = parseFloat(baseFareEl.value || "0");
+  const POLL_MS = 5000;
+
+  function checks() {
+    return Array.from(grid.querySelectorAll(".seat-check"));
+  }
 
   function updateUI() {
-    const selected = Array.from(checks).filter(c => c.checked);
+    const all = checks();
+    const selected = all.filter(c => c.checked);
     const seatNames = selected.map(s => s.dataset.seatNumber);
 
     // Toggle label selected state
-    selected.forEach(c => {
-      const label = document.querySelector(`label[for="${c.id}"]`);
-      if (label) label.classList.add("selected");
-    });
-    Array.from(checks).filter(c => !c.checked).forEach(c => {
-      const label = document.querySelector(`label[for="${c.id}"]`);
-      if (label) label.classList.remove("selected");
+    all.forEach(c => {
+      const label = grid.querySelector(`label[for="${c.id}"]`);
+      if (label) label.classList.toggle("selected", c.checked);
     });
 
     selectedSeatsText.textContent = seatNames.length ? seatNames.join(", ") : "None";
     totalFareEl.textContent = (selected.length * baseFare).toFixed(2);
   }
 
-  checks.forEach(c => c.addEventListener("change", updateUI));
+  // Markup mirrors buses/seat_select.html for both seat states.
+  function renderSeat(item, available) {
+    const id = item.dataset.seatId;
+    const number = item.dataset.seatNumber;
+    const isAvailable = !!item.querySelector(".seat-check");
+    if (isAvailable === available) return;
+
+    item.textContent = "";
+    if (available) {
+      const input = document.createElement("input");
+      input.className = "d-none seat-check";
+      input.type = "checkbox";
+      input.name = "seats";
+      input.value = id;
+      input.id = `seat${id}`;
+      input.dataset.seatNumber = number;
+
+      const label = document.createElement("label");
+      label.className = "seat-btn d-flex align-items-center justify-content-center";
+      label.htmlFor = input.id;
+      label.textContent = number;
+
+      item.append(input, label);
+    } else {
+      const button = document.createElement("button");
+      button.type = "button";
+      button.className = "seat-btn unavailable";
+      button.disabled = true;
+      button.title = "Unavailable";
+      button.textContent = number;
+      item.append(button);
+    }
+  }
+
+  // Conditional polling: an unchanged seat map costs the server a 304.
+  let etag = null;
+
+  async function poll() {
+    const headers = { "Accept": "application/json" };
+    if (etag) headers["If-None-Match"] = etag;
+
+    try {
+      const res = await fetch(grid.dataset.seatMapUrl, { headers, cache: "no-store" });
+      if (res.status === 200) {
+        etag = res.headers.get("ETag");
+        const data = await res.json();
+        data.seats.forEach(seat => {
+          const item = grid.querySelector(`.seat-item[data-seat-id="${seat.id}"]`);
+          if (item) renderSeat(item, seat.available);
+        });
+        updateUI();
+      }
+    } catch (e) {
+      // Network hiccup: keep the current map and try again next tick.
+    }
+  }
+
+  grid.addEventListener("change", e => {
+    if (e.target.classList.contains("seat-check")) updateUI();
+  });
   updateUI();
-})();
\ No newline at end of file
+
+  // Live pushes, only offered (data-seat-events-url) when the site is served
+  // under ASGI. While the stream is open polling pauses; if it drops, polling
+  // picks up again until EventSource reconnects.
+  let streamOpen = false;
+
+  if (window.EventSource && grid.dataset.seatEventsUrl) {
+    const source = new EventSource(grid.dataset.seatEventsUrl);
+    const apply = available => e => {
+      JSON.parse(e.data).seats.forEach(id => {
+        const item = grid.querySelector(`.seat-item[data-seat-id="${id}"]`);
+        if (item) renderSeat(item, available);
+      });
+      etag = null;  // pushed state is newer than the last polled map
+      updateUI();
+    };
+    source.addEventListener("locked", apply(false));
+    source.addEventListener("booked", apply(false));
+    source.addEventListener("released", apply(true));
+    source.onopen = () => { streamOpen = true; poll(); };
+    source.onerror = () => {
+      streamOpen = false;
+      // A 204 (stream not served) closes the source for good; keep polling.
+      if (source.readyState === EventSource.CLOSED) source.close();
+    };
+  }
+
+  if (grid.dataset.seatMapUrl) {
+    poll();
+    setInterval(() => {
+      if (!document.hidden && !streamOpen) poll();
+    }, POLL_MS);
+  }
+})();